@@ -3,13 +3,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
+import os
+import queue
 from datetime import datetime
-import sqlite3
 from sqlite3 import Error
 import matplotlib.pyplot as plt
 import seaborn as sns
 from chatbot import render_chatbot
+from predictor import predict_depression, explain_depression, what_if_depression
+from database import DB_PATH, fetch_precautions, confirm_diagnosis
+from database import mean_probability_by_age, low_margin_predictions
+from database import create_connection as pooled_connection
+from migrations import migrate
+from summary_stats import fetch_statistics, fetch_daily
+from model_registry import ModelRegistry
+from drift_monitor import DriftMonitor, drift_level
+from assessment_writer import AssessmentWriter, assessment_record
+from data_export import EXPORTS, EXPORT_FORMATS, EXPORT_MAX_BYTES, PREVIEW_ROWS, preview, export_to_tempfile
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -118,314 +128,136 @@ st.markdown("""
 
 # Database setup
 def create_connection():
-    """Create a database connection"""
+    """Create a database connection (from the shared WAL connection pool)"""
     conn = None
     try:
-        conn = sqlite3.connect('depression_data.db')
+        conn = pooled_connection()
         return conn
     except Error as e:
         st.error(f"Error connecting to database: {e}")
     return conn
 
 def create_tables(conn):
-    """Create necessary tables if they don't exist"""
+    """Create the tables, or upgrade an existing database to the current schema"""
     try:
-        cursor = conn.cursor()
-        
-        # Patients table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS patients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id TEXT UNIQUE,
-            age_group TEXT,
-            gender TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Symptoms table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS symptoms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id TEXT,
-            feeling_hopeless INTEGER,
-            loss_of_interest INTEGER,
-            appetite_change INTEGER,
-            disturbed_sleep INTEGER,
-            low_energy INTEGER,
-            lack_concentration INTEGER,
-            suicidal_thoughts INTEGER,
-            temper_outburst INTEGER,
-            panic_attack INTEGER,
-            mood_swing INTEGER,
-            medical_issue INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
-        )
-        ''')
-        
-        # Predictions table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id TEXT,
-            predicted_type TEXT,
-            confidence REAL,
-            probabilities TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
-        )
-        ''')
-        
-        # Precautions table (pre-populated)
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS precautions (
-            depression_type TEXT PRIMARY KEY,
-            immediate_actions TEXT,
-            lifestyle_changes TEXT,
-            professional_help TEXT,
-            emergency_contacts TEXT
-        )
-        ''')
-        
-        # Pre-populate precautions table
-        precautions_data = [
-            ('Clinical Depression', 
-             'Consult a psychiatrist immediately, Start therapy sessions, Consider medication if prescribed',
-             'Regular exercise, Balanced diet, Consistent sleep schedule, Mindfulness meditation',
-             'Cognitive Behavioral Therapy (CBT), Psychiatrist consultation, Support groups',
-             'National Suicide Prevention Lifeline: 1-800-273-TALK, Crisis Text Line: Text HOME to 741741'),
-            
-            ('PDD', 
-             'Schedule regular therapy sessions, Monitor symptom patterns, Keep a mood journal',
-             'Establish daily routine, Social engagement activities, Stress management techniques',
-             'Long-term psychotherapy, Regular psychiatric follow-ups, Group therapy',
-             'Therapist contact info, Trusted family member, Local mental health services'),
-            
-            ('Medical Depression', 
-             'Consult with primary physician, Review current medications, Address underlying medical conditions',
-             'Manage underlying health condition, Regular medical checkups, Medication adherence',
-             'Collaborative care with physicians, Psychiatrist for comorbid conditions',
-             'Primary care physician, Emergency medical services: 911'),
-            
-            ('DMDD', 
-             'Behavioral therapy for children, Parent management training, School intervention if needed',
-             'Consistent daily structure, Clear behavioral expectations, Positive reinforcement',
-             'Child psychologist, Family therapy, School counselor involvement',
-             'Pediatrician, Child mental health services, School counselor'),
-            
-            ('PMDD', 
-             'Track menstrual cycle symptoms, Consult gynecologist, Consider hormonal treatment',
-             'Dietary changes (reduce salt/caffeine), Regular exercise, Stress reduction techniques',
-             'Gynecologist consultation, Psychiatrist for symptom management',
-             'Gynecologist contact, Women\'s health clinic, Local support groups')
-        ]
-        
-        cursor.execute("SELECT COUNT(*) FROM precautions")
-        if cursor.fetchone()[0] == 0:
-            cursor.executemany('''
-            INSERT OR REPLACE INTO precautions 
-            (depression_type, immediate_actions, lifestyle_changes, professional_help, emergency_contacts)
-            VALUES (?, ?, ?, ?, ?)
-            ''', precautions_data)
-        
-        conn.commit()
-        
+        migrate(conn)
     except Error as e:
         st.error(f"Error creating tables: {e}")
 
-def save_prediction_to_db(patient_id, symptoms_dict, prediction, confidence, probabilities):
-    """Save prediction data to database"""
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            
-            # Check if patient exists
-            cursor.execute("SELECT id FROM patients WHERE patient_id = ?", (patient_id,))
-            patient = cursor.fetchone()
-            
-            if not patient:
-                # Create new patient
-                cursor.execute('''
-                INSERT INTO patients (patient_id, age_group, gender, timestamp)
-                VALUES (?, ?, ?, ?)
-                ''', (patient_id, symptoms_dict.get('Age', 'unknown'), 
-                     symptoms_dict.get('gender', 'unknown'), datetime.now()))
-            
-            # Save symptoms
-            cursor.execute('''
-            INSERT INTO symptoms 
-            (patient_id, feeling_hopeless, loss_of_interest, appetite_change, 
-             disturbed_sleep, low_energy, lack_concentration, suicidal_thoughts,
-             temper_outburst, panic_attack, mood_swing, medical_issue, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                patient_id,
-                symptoms_dict.get('Feelinghopeless', 0),
-                symptoms_dict.get('lossofinterest', 0),
-                symptoms_dict.get('appetitechange', 0),
-                symptoms_dict.get('distrubedsleepcycle', 0),
-                symptoms_dict.get('low energy', 0),
-                symptoms_dict.get('lackofconcentration', 0),
-                symptoms_dict.get('suicidalthoughts', 0),
-                symptoms_dict.get('temperoutburst', 0),
-                symptoms_dict.get('panicattack', 0),
-                symptoms_dict.get('moodswing', 0),
-                symptoms_dict.get('medicalissue', 0),
-                datetime.now()
-            ))
-            
-            # Save prediction
-            cursor.execute('''
-            INSERT INTO predictions 
-            (patient_id, predicted_type, confidence, probabilities, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (patient_id, prediction, confidence, str(probabilities), datetime.now()))
-            
-            conn.commit()
-            conn.close()
-            return True
-            
-        except Error as e:
-            st.error(f"Error saving to database: {e}")
-            return False
-    return False
+def save_prediction_to_db(patient_id, symptoms_dict, prediction, confidence, probabilities, model_version=None):
+    """Save prediction data to database (queued; committed in the background)"""
+    # Created (and warmed up from the table) before this assessment is stored
+    drift_monitor = get_drift_monitor()
+    record = assessment_record(patient_id, symptoms_dict, prediction, confidence, probabilities, model_version)
+    try:
+        get_assessment_writer().submit(record)
+    except queue.Full:
+        st.error("The database is busy right now. Please try saving again in a moment.")
+        return False
+    except (Error, OSError) as e:
+        st.error(f"Error saving to database: {e}")
+        return False
+    
+    if drift_monitor:
+        drift_monitor.observe(symptoms_dict, prediction)
+    return True
 
 def get_precautions(depression_type):
     """Get precautions for a specific depression type"""
     conn = create_connection()
     if conn:
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM precautions WHERE depression_type = ?", (depression_type,))
-            result = cursor.fetchone()
+            result = fetch_precautions(conn, depression_type)
             conn.close()
-            
-            if result:
-                return {
-                    'depression_type': result[0],
-                    'immediate_actions': result[1],
-                    'lifestyle_changes': result[2],
-                    'professional_help': result[3],
-                    'emergency_contacts': result[4]
-                }
+            return result
         except Error as e:
             st.error(f"Error fetching precautions: {e}")
     return None
 
 def get_statistics():
-    """Get statistics from database"""
+    """Get statistics from database (summary tables kept current on every insert)"""
     conn = create_connection()
     if conn:
         try:
-            cursor = conn.cursor()
-            
-            # Total predictions
-            cursor.execute("SELECT COUNT(*) FROM predictions")
-            total_result = cursor.fetchone()
-            total_predictions = total_result[0] if total_result and total_result[0] is not None else 0
-            
-            # Predictions by type
-            cursor.execute("""
-                SELECT predicted_type, COUNT(*) as count 
-                FROM predictions 
-                GROUP BY predicted_type 
-                ORDER BY count DESC
-            """)
-            predictions_by_type = cursor.fetchall()
-            
-            # Most common symptoms - using COALESCE to handle NULL values
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(feeling_hopeless), 0) as hopeless,
-                    COALESCE(SUM(loss_of_interest), 0) as interest_loss,
-                    COALESCE(SUM(appetite_change), 0) as appetite,
-                    COALESCE(SUM(disturbed_sleep), 0) as sleep,
-                    COALESCE(SUM(low_energy), 0) as energy,
-                    COALESCE(SUM(lack_concentration), 0) as concentration,
-                    COALESCE(SUM(suicidal_thoughts), 0) as suicidal,
-                    COALESCE(SUM(temper_outburst), 0) as temper,
-                    COALESCE(SUM(panic_attack), 0) as panic,
-                    COALESCE(SUM(mood_swing), 0) as mood,
-                    COALESCE(SUM(medical_issue), 0) as medical
-                FROM symptoms
-            """)
-            symptom_counts = cursor.fetchone()
-            
+            stats = fetch_statistics(conn)
+            stats['daily'] = fetch_daily(conn)
             conn.close()
-            
-            # Ensure symptom_counts is a tuple of integers
-            if symptom_counts:
-                symptom_counts = tuple(int(x) for x in symptom_counts)
-            else:
-                symptom_counts = (0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
-            
-            return {
-                'total_predictions': total_predictions,
-                'predictions_by_type': predictions_by_type if predictions_by_type else [],
-                'symptom_counts': symptom_counts
-            }
+            return stats
             
         except Error as e:
             st.error(f"Error fetching statistics: {e}")
             return None
     return None
 
+def prepare_export(query, export_format, export_key):
+    """Stream an export to a temporary file kept for this session, replacing the previous one"""
+    previous = st.session_state.pop('export_file', None)
+    if previous and os.path.exists(previous['path']):
+        os.remove(previous['path'])
+    conn = create_connection()
+    if conn:
+        try:
+            path, rows = export_to_tempfile(conn, query, export_format)
+            st.session_state['export_file'] = {'key': export_key, 'path': path, 'rows': rows}
+        except (Error, OSError, RuntimeError) as e:
+            st.error(f"Error exporting data: {e}")
+        finally:
+            conn.close()
+
+AGE_GROUPS = ["youth", "middel-aged", "adult", "elderly"]
+
+# Display names for the model's feature columns
+FEATURE_LABELS = {
+    'Feelinghopeless': 'Hopeless',
+    'lossofinterest': 'Interest Loss',
+    'appetitechange': 'Appetite',
+    'distrubedsleepcycle': 'Sleep',
+    'low energy': 'Energy',
+    'lackofconcentration': 'Concentration',
+    'suicidalthoughts': 'Suicidal',
+    'temperoutburst': 'Temper',
+    'panicattack': 'Panic',
+    'moodswing': 'Mood',
+    'medicalissue': 'Medical',
+    'Age': 'Age Group'
+}
+
 # Load model
 @st.cache_resource
+def get_model_registry():
+    """Model registry shared by all sessions; new versions are swapped in by a watcher thread"""
+    return ModelRegistry(fallback_path='depression_prediction_model.pkl').start_watcher()
+
 def load_model():
-    """Load the trained model"""
+    """Load the trained model (the registry's current version)"""
     try:
-        model_package = joblib.load('depression_prediction_model.pkl')
+        model_package = get_model_registry().current()
         return model_package
     except:
         st.warning("Model file not found. Please ensure 'depression_prediction_model.pkl' is in the same directory.")
         return None
 
-def predict_depression(symptoms_dict, model_package):
-    """Predict depression type based on symptoms"""
-    if not model_package:
-        return "Model not loaded", {}, 0.0
-    
-    model = model_package['model']
-    scaler = model_package['scaler']
-    label_encoder = model_package['label_encoder']
-    
-    # Create a dataframe with all possible columns
-    all_columns = model_package['feature_names']
-    input_data = pd.DataFrame(0, index=[0], columns=all_columns)
-    
-    # Fill in the provided symptoms
-    for symptom, value in symptoms_dict.items():
-        if symptom in input_data.columns:
-            if isinstance(value, str):
-                input_data[symptom] = 1 if value.upper() == 'Y' else 0
-            else:
-                input_data[symptom] = value
-        elif symptom == 'Age':
-            age_col = f'Age_{symptoms_dict["Age"]}'
-            if age_col in input_data.columns:
-                input_data[age_col] = 1
-    
-    # Scale the input
-    input_scaled = scaler.transform(input_data)
-    
-    # Make prediction
-    prediction_encoded = model.predict(input_scaled)[0]
-    prediction_prob = model.predict_proba(input_scaled)[0]
-    
-    # Decode the prediction
-    prediction = label_encoder.inverse_transform([prediction_encoded])[0]
-    confidence = prediction_prob[prediction_encoded]
-    
-    # Get probabilities for all classes
-    probabilities = {}
-    for i, prob in enumerate(prediction_prob):
-        class_name = label_encoder.inverse_transform([i])[0]
-        probabilities[class_name] = float(prob)
-    
-    return prediction, probabilities, confidence
+@st.cache_resource
+def get_assessment_writer():
+    """Background writer shared by all sessions; replays assessments a crash left uncommitted"""
+    return AssessmentWriter(DB_PATH).start()
+
+@st.cache_resource
+def get_drift_monitor():
+    """Sliding-window drift monitor shared by all sessions, warmed up from the newest assessments"""
+    model_package = load_model()
+    if model_package is None:
+        return None
+    monitor = DriftMonitor.for_model(model_package)
+    conn = create_connection()
+    if conn:
+        try:
+            monitor.load_recent(conn)
+        except Error as e:
+            st.warning(f"Drift monitor starts empty: {e}")
+        finally:
+            conn.close()
+    return monitor
 
 # Main app
 def main():
@@ -543,7 +375,7 @@ def main():
             with col1:
                 age_group = st.selectbox(
                     "Age Group",
-                    ["youth", "middel-aged", "adult", "elderly"],
+                    AGE_GROUPS,
                     help="Select your age group"
                 )
             with col2:
@@ -674,7 +506,9 @@ def main():
                         st.markdown(f"**Patient ID:** {patient_id}")
                         st.markdown('</div>', unsafe_allow_html=True)
                         
-                        # Probability chart
+                        # Probability chart and the symptoms that drove it
+                        chart_col1, chart_col2 = st.columns(2)
+                        
                         fig = go.Figure(data=[
                             go.Bar(
                                 x=list(probabilities.keys()),
@@ -689,7 +523,46 @@ def main():
                             yaxis_tickformat=".0%",
                             height=400
                         )
-                        st.plotly_chart(fig, use_container_width=True)
+                        with chart_col1:
+                            st.plotly_chart(fig, use_container_width=True)
+                        
+                        explanation = explain_depression(symptoms, model_package, prediction)
+                        if explanation:
+                            contributions = sorted(explanation['contributions'].items(), key=lambda item: item[1])
+                            fig = go.Figure(data=[
+                                go.Bar(
+                                    x=[value for _, value in contributions],
+                                    y=[FEATURE_LABELS.get(name, name) for name, _ in contributions],
+                                    orientation='h',
+                                    marker_color=['#3B82F6' if value > 0 else '#F87171' for _, value in contributions]
+                                )
+                            ])
+                            fig.update_layout(
+                                title=f"What Drove {prediction} (baseline {explanation['bias']:.0%})",
+                                xaxis_title="Change in Probability",
+                                xaxis_tickformat="+.0%",
+                                height=400
+                            )
+                            with chart_col2:
+                                st.plotly_chart(fig, use_container_width=True)
+                        
+                        # What-if sensitivity: every single-answer change, scored in one batch
+                        with st.expander("🔀 What If? How each answer affects the result"):
+                            what_if_rows = []
+                            for variant in what_if_depression(symptoms, model_package, AGE_GROUPS):
+                                if variant['feature'] == 'Age':
+                                    change = f"Age Group → {variant['value']}"
+                                else:
+                                    answer = 'Yes' if variant['value'] else 'No'
+                                    change = f"{FEATURE_LABELS.get(variant['feature'], variant['feature'])} → {answer}"
+                                what_if_rows.append({
+                                    'Change': change,
+                                    'Predicted Type': variant['prediction'],
+                                    'Confidence': f"{variant['confidence']:.1%}",
+                                    f'{prediction} Probability': f"{variant['shift']:+.1%}",
+                                    'Type Changes': '⚠️' if variant['prediction'] != prediction else ''
+                                })
+                            st.dataframe(pd.DataFrame(what_if_rows), use_container_width=True, hide_index=True)
                         
                         # Get and display precautions
                         precautions = get_precautions(prediction)
@@ -730,7 +603,8 @@ def main():
                             symptoms_dict['Age'] = age_group
                             symptoms_dict['gender'] = gender
                             
-                            if save_prediction_to_db(patient_id, symptoms_dict, prediction, confidence, probabilities):
+                            if save_prediction_to_db(patient_id, symptoms_dict, prediction, confidence, probabilities,
+                                                     model_package.get('model_version')):
                                 st.success("✅ Assessment saved successfully!")
                                 st.info(f"Your Patient ID: **{patient_id}** - Save this for future reference")
                         
@@ -822,6 +696,13 @@ def main():
                 else:
                     st.info("No symptom data available for chart.")
             
+            # Assessments per day
+            if stats['daily']:
+                df_daily = pd.DataFrame(stats['daily'], columns=['Day', 'Assessments'])
+                fig = px.line(df_daily, x='Day', y='Assessments', markers=True,
+                              title="Assessments per Day (last 30 active days)")
+                st.plotly_chart(fig, use_container_width=True)
+            
             # Raw data
             with st.expander("View Raw Data"):
                 if stats['predictions_by_type']:
@@ -961,7 +842,9 @@ def main():
         if password == "admin123":  # Change this in production
             st.success("✅ Admin access granted")
             
-            tab1, tab2, tab3 = st.tabs(["📊 Database Stats", "📥 Export Data", "🔄 Update Precautions"])
+            tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📊 Database Stats", "📥 Export Data", "🔄 Update Precautions",
+                                                          "✅ Confirm Diagnoses", "📈 Input Drift",
+                                                          "🎯 Probability Analytics"])
             
             with tab1:
                 conn = create_connection()
@@ -975,6 +858,12 @@ def main():
                         count = cursor.fetchone()[0]
                         st.metric(f"{table.capitalize()} Records", count)
                     
+                    writer = get_assessment_writer()
+                    st.caption(f"{writer.pending()} assessments waiting to be written"
+                               + (f", {writer.rejected} set aside in {writer.rejected_path}"
+                                  if writer.rejected else "")
+                               + (f" (last write failed: {writer.last_error})" if writer.last_error else ""))
+                    
                     # Recent predictions
                     cursor.execute("""
                         SELECT p.patient_id, pr.predicted_type, pr.confidence, pr.timestamp
@@ -995,35 +884,40 @@ def main():
             with tab2:
                 st.subheader("Export Data")
                 
+                export_name = st.selectbox("Select data to export", list(EXPORTS),
+                                           format_func=lambda name: EXPORTS[name][0])
+                export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True,
+                                         format_func=lambda f: "CSV (gzip)" if f == 'csv' else "Parquet")
+                query = EXPORTS[export_name][1]
+                
                 conn = create_connection()
                 if conn:
-                    export_option = st.selectbox("Select data to export", 
-                                                ["All Predictions", "Symptoms Data", "Patient Demographics"])
-                    
-                    if export_option == "All Predictions":
-                        query = """
-                            SELECT p.*, s.*, pr.*
-                            FROM predictions pr
-                            JOIN patients p ON pr.patient_id = p.patient_id
-                            JOIN symptoms s ON pr.patient_id = s.patient_id
-                        """
-                    elif export_option == "Symptoms Data":
-                        query = "SELECT * FROM symptoms"
-                    else:
-                        query = "SELECT * FROM patients"
-                    
-                    df_export = pd.read_sql_query(query, conn)
-                    conn.close()
-                    
-                    st.dataframe(df_export, use_container_width=True)
-                    
-                    csv = df_export.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download CSV",
-                        data=csv,
-                        file_name=f"depression_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
-                    )
+                    try:
+                        st.caption(f"Preview of the first {PREVIEW_ROWS} rows")
+                        st.dataframe(preview(conn, query), use_container_width=True)
+                    except Error as e:
+                        st.error(f"Error reading {EXPORTS[export_name][0]}: {e}")
+                    finally:
+                        conn.close()
+                
+                # The file is written in chunks on request, not on every rerun of the page
+                st.caption(f"Downloads are limited to {EXPORT_MAX_BYTES // 2**20} MB; "
+                           "use python data_export.py for larger exports")
+                if st.button("Prepare Export"):
+                    with st.spinner("Writing export file..."):
+                        prepare_export(query, export_format, (export_name, export_format))
+                
+                export_file = st.session_state.get('export_file')
+                if (export_file and export_file['key'] == (export_name, export_format)
+                        and os.path.exists(export_file['path'])):
+                    with open(export_file['path'], 'rb') as f:
+                        st.download_button(
+                            label=f"📥 Download {export_file['rows']} rows",
+                            data=f,
+                            file_name=f"depression_{export_name}_{datetime.now().strftime('%Y%m%d')}"
+                                      f"{EXPORT_FORMATS[export_format]}",
+                            mime="application/gzip" if export_format == 'csv' else "application/octet-stream"
+                        )
             
             with tab3:
                 st.subheader("Update Precautions")
@@ -1072,6 +966,128 @@ def main():
                                 st.success("✅ Precautions updated successfully!")
                     
                     conn.close()
+            
+            with tab4:
+                st.subheader("Confirm Diagnoses")
+                st.caption("Confirmed assessments are used as training data by retrain_model.py")
+                
+                conn = create_connection()
+                if conn:
+                    pending = pd.read_sql_query("""
+                        SELECT id, patient_id, predicted_type, confidence, timestamp
+                        FROM predictions
+                        WHERE confirmed_type IS NULL
+                        ORDER BY timestamp DESC
+                        LIMIT 50
+                    """, conn)
+                    
+                    if pending.empty:
+                        st.info("No unconfirmed assessments")
+                    else:
+                        st.dataframe(pending, use_container_width=True)
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            prediction_id = st.selectbox(
+                                "Assessment",
+                                pending['id'].tolist(),
+                                format_func=lambda i: f"#{i} - {pending.set_index('id').at[i, 'patient_id']}"
+                            )
+                        with col2:
+                            cursor = conn.cursor()
+                            cursor.execute("SELECT depression_type FROM precautions")
+                            diagnosis_types = [row[0] for row in cursor.fetchall()]
+                            predicted = pending.set_index('id').at[prediction_id, 'predicted_type']
+                            confirmed_type = st.selectbox(
+                                "Confirmed diagnosis",
+                                diagnosis_types,
+                                index=diagnosis_types.index(predicted) if predicted in diagnosis_types else 0
+                            )
+                        
+                        if st.button("Confirm Diagnosis", type="primary"):
+                            if confirm_diagnosis(conn, int(prediction_id), confirmed_type):
+                                st.success(f"✅ Assessment #{prediction_id} confirmed as {confirmed_type}")
+                    
+                    conn.close()
+            
+            with tab5:
+                st.subheader("Input Drift")
+                st.caption("Recent assessments compared with the model's training data. "
+                           "PSI below 0.1 is stable, 0.1-0.25 a moderate shift, above 0.25 a major shift.")
+                
+                model_package = load_model()
+                drift_monitor = get_drift_monitor()
+                reference_profile = model_package.get('reference_profile') if model_package else None
+                if reference_profile is None:
+                    st.info("The current model has no reference profile. Retrain it, or run "
+                            "`python drift_monitor.py profile <training.csv>` on the model file.")
+                elif drift_monitor is not None:
+                    try:
+                        drift_scores = drift_monitor.scores(reference_profile)
+                    except ValueError as e:
+                        st.warning(f"Drift scores unavailable: {e}")
+                        drift_scores = None
+                    if drift_scores == []:
+                        st.info("No assessments recorded yet")
+                    
+                    for window_scores in drift_scores or []:
+                        st.markdown(f"**Last {window_scores['assessments']} assessments** "
+                                    f"(window of {window_scores['window']})")
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Symptom PSI (max)", f"{window_scores['symptom_psi_max']:.3f}",
+                                      help=f"Most shifted: {FEATURE_LABELS.get(window_scores['most_shifted_symptom'])}")
+                            st.caption(drift_level(window_scores['symptom_psi_max']))
+                        with col2:
+                            st.metric("Age Mix PSI", f"{window_scores['age_psi']:.3f}",
+                                      help=f"KL: {window_scores['age_kl']:.3f}")
+                            st.caption(drift_level(window_scores['age_psi']))
+                        with col3:
+                            st.metric("Predicted Type PSI", f"{window_scores['class_psi']:.3f}",
+                                      help=f"KL: {window_scores['class_kl']:.3f}")
+                            st.caption(drift_level(window_scores['class_psi']))
+                    
+                    if drift_scores:
+                        latest = drift_scores[-1]
+                        df_prevalence = pd.DataFrame({
+                            'Symptom': [FEATURE_LABELS.get(s, s) for s in reference_profile['symptoms']],
+                            'Training': reference_profile['symptom_prevalence'],
+                            'Recent': [latest['symptom_prevalence'][s] for s in reference_profile['symptoms']],
+                        }).melt(id_vars='Symptom', var_name='Data', value_name='Prevalence')
+                        fig = px.bar(df_prevalence, x='Symptom', y='Prevalence', color='Data', barmode='group',
+                                     title=f"Symptom prevalence, last {latest['assessments']} assessments")
+                        st.plotly_chart(fig, use_container_width=True)
+            
+            with tab6:
+                st.subheader("Probability Analytics")
+                
+                conn = create_connection()
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT depression_type FROM precautions")
+                    analysis_types = [row[0] for row in cursor.fetchall()]
+                    
+                    analysis_type = st.selectbox("Depression type", analysis_types, key="analytics_type")
+                    by_age = pd.DataFrame(mean_probability_by_age(conn, analysis_type),
+                                          columns=['Age Group', 'Assessments', 'Mean Probability'])
+                    if by_age.empty:
+                        st.info("No stored probabilities yet")
+                    else:
+                        fig = px.bar(by_age, x='Age Group', y='Mean Probability', hover_data=['Assessments'],
+                                     title=f"Mean {analysis_type} probability by age group")
+                        fig.update_layout(yaxis_range=[0, 1])
+                        st.plotly_chart(fig, use_container_width=True)
+                    
+                    st.markdown("**Low-margin predictions**")
+                    max_margin = st.slider("Largest gap between the two most likely types",
+                                           0.0, 1.0, 0.1, 0.01)
+                    close_calls = low_margin_predictions(conn, max_margin)
+                    if close_calls.empty:
+                        st.info("No predictions within that margin")
+                    else:
+                        st.dataframe(close_calls, use_container_width=True)
+                    
+                    conn.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
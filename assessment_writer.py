@@ -0,0 +1,375 @@
+# assessment_writer.py - Write-behind persistence of assessments with group commit
+
+import atexit
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from database import DB_PATH, SYMPTOM_COLUMNS, create_connection, parse_probabilities, probability_margin
+from database import symptom_mask
+
+SPILL_SUFFIX = '.spill'
+REJECTED_SUFFIX = '.rejected'
+MAX_QUEUE = 1000
+MAX_BATCH = 500
+SUBMIT_TIMEOUT = 2.0
+RETRY_DELAY = 0.5
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def lock_file(f, wait=False):
+    """Lock an open file against other processes; False if one holds it (and not waiting)"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def same_file(f, path):
+    """Whether path still names the open file f (it may have been replaced or removed)"""
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except OSError:
+        return False
+
+def assessment_record(patient_id, symptoms_dict, prediction, confidence, probabilities, model_version=None):
+    """One assessment as a JSON-serialisable record, timestamped now"""
+    return {
+        'patient_id': patient_id,
+        'age_group': symptoms_dict.get('Age', 'unknown'),
+        'gender': symptoms_dict.get('gender', 'unknown'),
+        'symptoms': [int(symptoms_dict.get(feature, 0)) for feature in SYMPTOM_COLUMNS],
+        'predicted_type': str(prediction),
+        'confidence': float(confidence),
+        'probabilities': parse_probabilities(probabilities),
+        'model_version': model_version,
+        'timestamp': str(datetime.now()),
+    }
+
+def is_transient(error):
+    """Errors worth retrying unchanged: another connection holds the database lock"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    name = getattr(error, 'sqlite_errorname', '')
+    return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED')) or 'locked' in str(error)
+
+def advance_checkpoint(cursor, spill_path, seq):
+    cursor.execute("""
+        INSERT INTO writer_checkpoint (spill_file, last_seq) VALUES (?, ?)
+        ON CONFLICT (spill_file) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq)
+    """, (os.path.basename(spill_path), seq))
+
+def write_batch(conn, records, spill_path):
+    """Insert records in one transaction and advance the spill checkpoint with them"""
+    cursor = conn.cursor()
+    # The write lock is taken up front, so the assessment ids handed out here stay free
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM assessments")
+    first_id = cursor.fetchone()[0] + 1
+    assessment_ids = range(first_id, first_id + len(records))
+    cursor.executemany("""
+        INSERT INTO assessments (id, patient_id, timestamp) VALUES (?, ?, ?)
+    """, [(a, r['patient_id'], r['timestamp']) for a, r in zip(assessment_ids, records)])
+    cursor.executemany("""
+        INSERT OR IGNORE INTO patients (patient_id, age_group, gender, timestamp)
+        VALUES (?, ?, ?, ?)
+    """, [(r['patient_id'], r['age_group'], r['gender'], r['timestamp']) for r in records])
+    cursor.executemany("""
+        INSERT INTO assessment_symptoms (assessment_id, patient_id, symptom_mask, timestamp)
+        VALUES (?, ?, ?, ?)
+    """, [(a, r['patient_id'], symptom_mask(r['symptoms']), r['timestamp'])
+          for a, r in zip(assessment_ids, records)])
+    # Spill files written before per-class storage hold the probabilities as str(dict)
+    probabilities = [parse_probabilities(r['probabilities']) for r in records]
+    cursor.executemany("""
+        INSERT INTO predictions (assessment_id, patient_id, predicted_type, confidence, margin,
+                                 model_version, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(a, r['patient_id'], r['predicted_type'], r['confidence'], probability_margin(p),
+           r['model_version'], r['timestamp']) for a, r, p in zip(assessment_ids, records, probabilities)])
+    cursor.executemany("""
+        INSERT INTO prediction_probabilities (assessment_id, depression_type, probability)
+        VALUES (?, ?, ?)
+    """, [(a, t, value) for a, p in zip(assessment_ids, probabilities) for t, value in p.items()])
+    advance_checkpoint(cursor, spill_path, max(r['seq'] for r in records))
+    conn.commit()
+
+class AssessmentWriter:
+    """Queues assessments for a background thread that commits them in batches
+
+    submit() appends the record to a spill file, fsyncs it, queues it and
+    returns; the writer commits whatever has queued up in one transaction.
+    The checkpoint committed with every batch makes sure no record is
+    stored twice. When the queue is full submit() waits up to ``timeout``
+    and then raises queue.Full. The database must be migrated
+    (migrations.py).
+
+    Each process writes its own spill file (<db>.<pid>.spill), locked for
+    as long as the writer runs. start() replays it, and the spill files of
+    processes that have exited, whose locks are free. One writer per
+    database per process.
+
+    Only a busy or locked database is retried. A record that cannot be
+    stored is found by splitting its batch, appended to the ``.rejected``
+    file next to the database and counted in ``rejected``, so it does not
+    hold up the records behind it.
+    """
+
+    def __init__(self, db_path=DB_PATH, spill_path=None, max_queue=MAX_QUEUE, max_batch=MAX_BATCH):
+        self.db_path = db_path
+        self.spill_path = spill_path or f"{db_path}.{os.getpid()}{SPILL_SUFFIX}"
+        self.rejected_path = db_path + SPILL_SUFFIX + REJECTED_SUFFIX
+        self.max_batch = max_batch
+        self.last_error = None
+        self.rejected = 0
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._spill = None
+        self._seq = 0
+
+    def _checkpoint(self, conn, spill_path):
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_seq FROM writer_checkpoint WHERE spill_file = ?",
+                       (os.path.basename(spill_path),))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _unreplayed(self, conn, f, spill_path):
+        """Records of an open spill file past its checkpoint, and the checkpoint"""
+        last_seq = self._checkpoint(conn, spill_path)
+        pending = []
+        f.seek(0)
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by the crash was never acknowledged
+            if record['seq'] > last_seq:
+                pending.append(record)
+        return pending, last_seq
+
+    def _replay(self, conn, records, spill_path):
+        self._store(conn, [records[start:start + self.max_batch]
+                           for start in range(0, len(records), self.max_batch)], spill_path=spill_path)
+        return len(records)
+
+    def _open_spill(self):
+        """Open and lock this process's spill file, waiting for a writer replaying it"""
+        while True:
+            f = open(self.spill_path, 'a+', encoding='utf-8')
+            lock_file(f, wait=True)
+            if same_file(f, self.spill_path):
+                return f
+            f.close()  # Replayed and removed by another process meanwhile
+
+    def recover(self):
+        """Commit spilled records earlier runs did not; returns how many
+
+        Replays this process's spill file (a run with the same pid that
+        crashed) and every other spill file of the database whose lock is
+        free, then removes those.
+        """
+        conn = create_connection(self.db_path)
+        recovered = 0
+        try:
+            own = self._spill is not None
+            f = self._spill if own else self._open_spill()
+            try:
+                pending, last_seq = self._unreplayed(conn, f, self.spill_path)
+                recovered += self._replay(conn, pending, self.spill_path)
+                f.seek(0)
+                f.truncate()
+            finally:
+                if not own:
+                    f.close()
+            self._seq = max([last_seq] + [r['seq'] for r in pending])
+
+            for path in glob.glob(glob.escape(self.db_path) + '*' + SPILL_SUFFIX):
+                if os.path.abspath(path) == os.path.abspath(self.spill_path):
+                    continue
+                try:
+                    f = open(path, 'r+', encoding='utf-8')
+                except OSError:
+                    continue
+                with f:
+                    # A running writer holds its file's lock; a file already
+                    # replayed by another process has been removed
+                    if not lock_file(f) or not same_file(f, path):
+                        continue
+                    try:
+                        recovered += self._replay(conn, self._unreplayed(conn, f, path)[0], path)
+                    except sqlite3.OperationalError as e:
+                        # Busy: left for the next start, the file stays as it is
+                        self.last_error = f"{os.path.basename(path)} not replayed yet: {e}"
+                        continue
+                    os.remove(path)
+                    conn.execute("DELETE FROM writer_checkpoint WHERE spill_file = ?", (os.path.basename(path),))
+                    conn.commit()
+        finally:
+            conn.close()
+        return recovered
+
+    def start(self):
+        """Replay spill files, then start the writer thread"""
+        if self._thread is None:
+            self._spill = self._open_spill()
+            recovered = self.recover()
+            if recovered:
+                print(f"✅ Recovered {recovered} assessments from spill files of {self.db_path}")
+            self._thread = threading.Thread(target=self._run, name='assessment-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def submit(self, record, timeout=SUBMIT_TIMEOUT):
+        """Queue one assessment record; raises queue.Full if the writer cannot keep up
+
+        The record is on disk (fsynced) when this returns.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise queue.Full
+        with self._lock:
+            self._seq += 1
+            record = dict(record, seq=self._seq)
+            self._spill.write(json.dumps(record) + '\n')
+            self._spill.flush()
+            os.fsync(self._spill.fileno())
+            self._queue.put(record)
+
+    def pending(self):
+        """Records queued but not committed yet"""
+        return self._queue.unfinished_tasks
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far is committed; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=10.0):
+        """Commit what is queued and stop the writer thread; the spill file goes if all is committed"""
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        if not self._queue.unfinished_tasks:
+            try:
+                os.remove(self.spill_path)
+                conn = create_connection(self.db_path)
+                try:
+                    conn.execute("DELETE FROM writer_checkpoint WHERE spill_file = ?",
+                                 (os.path.basename(self.spill_path),))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except (OSError, sqlite3.Error):
+                pass  # A leftover spill file is replayed (as empty) by the next start
+        self._spill.close()
+        self._spill = None
+
+    def _set_aside(self, conn, record, error, spill_path):
+        """Keep a record that cannot be stored in the rejected file and move the checkpoint past it"""
+        self.rejected += 1
+        self.last_error = f"assessment {record.get('seq')} set aside: {error!r}"
+        print(f"⚠️ Could not store {self.last_error}")
+        with open(self.rejected_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(record, error=repr(error)), default=str) + '\n')
+        cursor = conn.cursor()
+        advance_checkpoint(cursor, spill_path, record['seq'])
+        conn.commit()
+
+    def _store(self, conn, batches, done=None, spill_path=None):
+        """Commit the batches in order, consuming the list; transient errors are raised
+
+        A batch failing for any other reason is split in two until the
+        records at fault are isolated and set aside. ``done(n)`` is called
+        as records are committed or set aside.
+        """
+        spill_path = spill_path or self.spill_path
+        while batches:
+            records = batches[0]
+            try:
+                write_batch(conn, records, spill_path)
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if is_transient(e):
+                    raise
+                if len(records) > 1:
+                    middle = len(records) // 2
+                    batches[0:1] = [records[:middle], records[middle:]]
+                    continue
+                self._set_aside(conn, records[0], e, spill_path)
+            batches.pop(0)
+            if done is not None:
+                done(len(records))
+
+    def _done(self, count):
+        for _ in range(count):
+            self._queue.task_done()
+            self._slots.release()
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        # Whatever queued up while the last batch was committing goes in together
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = None
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            batches = [batch] if batch else []
+            while batches:
+                try:
+                    conn = conn or create_connection(self.db_path)
+                    rejected = self.rejected
+                    self._store(conn, batches, self._done)
+                    if self.rejected == rejected:
+                        self.last_error = None
+                except Exception as e:
+                    # Busy database, or not reachable at all: keep what is left
+                    # (it is also in the spill file) and try again
+                    self.last_error = str(e)
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                    time.sleep(RETRY_DELAY)
+
+            # Everything spilled is committed: start the spill file afresh
+            with self._lock:
+                try:
+                    if self._queue.unfinished_tasks == 0 and self._spill.tell():
+                        self._spill.seek(0)
+                        self._spill.truncate()
+                except OSError as e:
+                    self.last_error = str(e)
+        if conn is not None:
+            conn.close()
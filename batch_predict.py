@@ -0,0 +1,56 @@
+# batch_predict.py - Bulk scoring of questionnaire files from the command line
+
+import argparse
+import os
+import sys
+import pandas as pd
+from data_export import write_csv, write_parquet
+from predictor import MODEL_PATH, BATCH_CHUNK_SIZE, load_model_package, predict_depression_batch
+
+def read_input(input_path, chunk_size):
+    """Read a CSV or Parquet questionnaire file lazily, chunk by chunk"""
+    if input_path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet input requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunk_size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of symptom questionnaires")
+    parser.add_argument('input', help="CSV or Parquet file with symptom columns (Y/N) and 'Age'")
+    parser.add_argument('output', help="Where to write the predictions")
+    parser.add_argument('--format', choices=['csv', 'parquet'],
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument('--model', default=MODEL_PATH, help="Model package to load")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE,
+                        help="Rows scored per chunk")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'csv')
+
+    try:
+        model_package = load_model_package(args.model)
+    except FileNotFoundError:
+        print(f"❌ Model file not found: {args.model}")
+        return 1
+
+    chunks = predict_depression_batch(read_input(args.input, args.chunk_size), model_package,
+                                      chunk_size=args.chunk_size)
+    try:
+        if output_format == 'parquet':
+            rows = write_parquet(chunks, args.output)
+        else:
+            rows = write_csv(chunks, args.output)
+    except (OSError, RuntimeError) as e:
+        print(f"❌ Error scoring {args.input}: {e}")
+        return 1
+
+    print(f"✅ Scored {rows} questionnaires -> {os.path.abspath(args.output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# benchmark_inference.py - Latency benchmarks for the prediction path
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from predictor import (MODEL_PATH, file_hash, load_model_package, split_feature_names,
+                       encode_frame, score_matrix)
+
+BATCH_SIZES = [1, 100, 10000]
+
+def time_calls(fn, repeats, warmup=1):
+    """Run fn repeatedly and return the wall-clock time of each call in seconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples, batch_size=1):
+    """Latency percentiles (ms) and throughput (rows/s) for a list of timings"""
+    samples = np.asarray(samples)
+    return {
+        'repeats': len(samples),
+        'p50_ms': float(np.percentile(samples, 50) * 1000),
+        'p95_ms': float(np.percentile(samples, 95) * 1000),
+        'p99_ms': float(np.percentile(samples, 99) * 1000),
+        'mean_ms': float(samples.mean() * 1000),
+        'throughput_rows_per_s': float(batch_size / np.median(samples)),
+    }
+
+def make_questionnaires(n, feature_names, seed=42):
+    """Random Y/N questionnaires with an 'Age' column, as the app submits them"""
+    rng = np.random.default_rng(seed)
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    df = pd.DataFrame(rng.choice(['Y', 'N'], size=(n, len(symptom_columns))), columns=symptom_columns)
+    ages = [c[len('Age_'):] for c in age_columns] + ['elderly']
+    df['Age'] = rng.choice(ages, size=n)
+    return df
+
+def build_input_frame(questionnaires, feature_names):
+    """The DataFrame construction loop of predict_depression(), for n rows"""
+    input_data = pd.DataFrame(0, index=range(len(questionnaires)), columns=feature_names)
+    for symptom in questionnaires.columns:
+        if symptom in input_data.columns:
+            input_data[symptom] = (questionnaires[symptom] == 'Y').astype(int)
+        elif symptom == 'Age':
+            for age_col in [c for c in feature_names if c.startswith('Age_')]:
+                input_data[age_col] = (questionnaires['Age'] == age_col[len('Age_'):]).astype(int)
+    return input_data
+
+def benchmark_load(model_path, repeats):
+    """Time cold (.pkl, no caches) and warm (mmap artifact) model loads"""
+    results = {}
+    results['unpickle'] = summarize(time_calls(lambda: joblib.load(model_path), repeats))
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        def cold_load():
+            for name in os.listdir(work_dir):
+                path = os.path.join(work_dir, name)
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+            shutil.copy(model_path, os.path.join(work_dir, 'model.pkl'))
+            load_model_package(os.path.join(work_dir, 'model.pkl'))
+
+        results['cold'] = summarize(time_calls(cold_load, repeats, warmup=0))
+
+        cached_path = os.path.join(work_dir, 'model.pkl')
+        load_model_package(cached_path)
+        results['warm'] = summarize(time_calls(lambda: load_model_package(cached_path), repeats))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def benchmark_stages(model_package, batch_size, repeats):
+    """Time each stage of the prediction path on one batch size"""
+    feature_names = list(model_package['feature_names'])
+    model = model_package['model']
+    scaler = model_package['scaler']
+    label_encoder = model_package['label_encoder']
+
+    questionnaires = make_questionnaires(batch_size, feature_names)
+    input_data = build_input_frame(questionnaires, feature_names)
+    input_scaled = scaler.transform(input_data)
+    predicted = model.predict(input_scaled)
+    X, age_codes = encode_frame(questionnaires, feature_names)
+
+    stages = {
+        'dataframe_construction': lambda: build_input_frame(questionnaires, feature_names),
+        'scaler_transform': lambda: scaler.transform(input_data),
+        'sklearn_predict': lambda: model.predict(input_scaled),
+        'sklearn_predict_proba': lambda: model.predict_proba(input_scaled),
+        'label_encoder_inverse_transform': lambda: label_encoder.inverse_transform(predicted),
+        'vectorized_encoding': lambda: encode_frame(questionnaires, feature_names),
+        'lookup_table': lambda: score_matrix(X, age_codes, model_package),
+    }
+    if model_package.get('engine') is not None:
+        stages['flat_forest_predict'] = lambda: model_package['engine'].predict(input_scaled)
+    if model_package.get('raw_engine') is not None:
+        stages['folded_forest_predict'] = lambda: model_package['raw_engine'].predict(X)
+        if batch_size == 1:
+            stages['anytime_forest_predict'] = lambda: model_package['raw_engine'].predict_anytime(X[0])
+
+    return {name: summarize(time_calls(fn, repeats), batch_size) for name, fn in stages.items()}
+
+def benchmark_anytime(model_package, repeats, n=200, tolerance=0.05):
+    """Trees walked and per-row latency of the early exit against the full forest"""
+    engine = model_package['raw_engine']
+    X, _ = encode_frame(make_questionnaires(n, list(model_package['feature_names'])),
+                        list(model_package['feature_names']))
+    results = {'n_trees': engine.n_trees}
+    for label, tol in (('exact', None), (f'tolerance_{tolerance}', tolerance)):
+        trees = [engine.predict_anytime(x, tolerance=tol)[3] for x in X]
+        timing = summarize(time_calls(lambda: [engine.predict_anytime(x, tolerance=tol) for x in X], repeats), n)
+        results[label] = {'mean_trees_used': float(np.mean(trees)), 'p50_ms_per_row': timing['p50_ms'] / n}
+    full = summarize(time_calls(lambda: [engine.predict(x[np.newaxis]) for x in X], repeats), n)
+    results['full_forest_p50_ms_per_row'] = full['p50_ms'] / n
+    results['saved_ms_per_row'] = results['full_forest_p50_ms_per_row'] - results['exact']['p50_ms_per_row']
+    return results
+
+def environment_info(model_path):
+    """Library versions and model identity, so runs can be compared"""
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit-learn': sklearn.__version__,
+        'model_path': model_path,
+        'model_hash': file_hash(model_path),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the depression prediction path")
+    parser.add_argument('--model', default=MODEL_PATH, help="Model package to benchmark")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--repeats', type=int, default=20, help="Timed calls per measurement")
+    parser.add_argument('--load-repeats', type=int, default=5, help="Timed calls per model load measurement")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    model_package = load_model_package(args.model, use_artifact=False)
+    report = {
+        'environment': environment_info(args.model),
+        'load_model': benchmark_load(args.model, args.load_repeats),
+        'batches': {str(n): benchmark_stages(model_package, n, args.repeats) for n in args.batch_sizes},
+    }
+    if model_package.get('raw_engine') is not None:
+        report['anytime'] = benchmark_anytime(model_package, args.repeats)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"✅ Benchmark written to {args.output}")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
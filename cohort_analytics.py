@@ -0,0 +1,170 @@
+# cohort_analytics.py - Symptom prevalence and co-occurrence of assessment cohorts from stored bitmasks
+
+import argparse
+import sys
+from sqlite3 import Error
+import numpy as np
+import pandas as pd
+from database import DB_PATH, SYMPTOM_COLUMNS, SYMPTOM_VECTORS, create_connection, mask_bits
+
+DB_CHUNK_ROWS = 50000
+SYMPTOM_FIELDS = list(SYMPTOM_COLUMNS.values())
+
+# Row m: the symptoms in mask m; POPCOUNT[m]: how many there are
+VECTOR_BITS = mask_bits(range(SYMPTOM_VECTORS))
+POPCOUNT = VECTOR_BITS.sum(axis=1)
+
+def symptoms_mask(symptoms):
+    """Bitmask of symptom columns (e.g. ['suicidal_thoughts', 'panic_attack'])"""
+    mask = 0
+    for symptom in symptoms:
+        if symptom not in SYMPTOM_FIELDS:
+            raise ValueError(f"Unknown symptom: {symptom}")
+        mask |= 1 << SYMPTOM_FIELDS.index(symptom)
+    return mask
+
+class CohortAnalytics:
+    """Every stored assessment's symptom mask, age group, gender and time, as NumPy arrays
+
+    Loaded once; cohorts are boolean selections made with array comparisons
+    and bit operations, and their statistics come from a 2048-bin histogram
+    of the selected masks, so no query goes back to SQLite.
+    """
+
+    def __init__(self, masks, age_groups, genders, timestamps):
+        self.masks = np.asarray(masks, dtype=np.uint16)
+        self.age_codes, self.age_groups = pd.factorize(pd.Series(age_groups).fillna('unknown'))
+        self.gender_codes, self.genders = pd.factorize(pd.Series(genders).fillna('unknown'))
+        self.timestamps = pd.to_datetime(pd.Series(timestamps), errors='coerce', format='mixed').to_numpy()
+
+    @classmethod
+    def load(cls, conn, chunk_size=DB_CHUNK_ROWS):
+        """Read the assessments a chunk at a time into arrays"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.symptom_mask, p.age_group, p.gender, s.timestamp
+            FROM assessment_symptoms s
+            LEFT JOIN patients p ON p.patient_id = s.patient_id
+            ORDER BY s.id
+        """)
+        masks, age_groups, genders, timestamps = [], [], [], []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            mask, age_group, gender, timestamp = zip(*rows)
+            masks.append(np.array(mask, dtype=np.uint16))
+            age_groups.extend(age_group)
+            genders.extend(gender)
+            timestamps.extend(timestamp)
+        masks = np.concatenate(masks) if masks else np.zeros(0, dtype=np.uint16)
+        return cls(masks, age_groups, genders, timestamps)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def select(self, age_group=None, gender=None, since=None, until=None,
+               all_of=(), any_of=(), none_of=()):
+        """Boolean selection of the assessments matching every filter given
+
+        since/until bound the timestamp (until exclusive); all_of, any_of and
+        none_of are lists of symptom columns tested against the masks.
+        """
+        selection = np.ones(len(self.masks), dtype=bool)
+        for value, codes, labels in ((age_group, self.age_codes, self.age_groups),
+                                     (gender, self.gender_codes, self.genders)):
+            if value is not None:
+                selection &= codes == (labels.get_loc(value) if value in labels else -2)
+        if since is not None:
+            selection &= self.timestamps >= np.datetime64(pd.Timestamp(since))
+        if until is not None:
+            selection &= self.timestamps < np.datetime64(pd.Timestamp(until))
+        if all_of:
+            required = symptoms_mask(all_of)
+            selection &= (self.masks & required) == required
+        if any_of:
+            selection &= (self.masks & symptoms_mask(any_of)) != 0
+        if none_of:
+            selection &= (self.masks & symptoms_mask(none_of)) == 0
+        return selection
+
+    def vector_counts(self, selection=None):
+        """Assessments per symptom mask (length 2048)"""
+        masks = self.masks if selection is None else self.masks[selection]
+        return np.bincount(masks, minlength=SYMPTOM_VECTORS)
+
+    def prevalence(self, selection=None):
+        """Fraction of the cohort reporting each symptom"""
+        counts = self.vector_counts(selection)
+        total = counts.sum()
+        return pd.Series(counts @ VECTOR_BITS / total if total else np.zeros(len(SYMPTOM_FIELDS)),
+                         index=SYMPTOM_FIELDS)
+
+    def co_occurrence(self, selection=None, normalize=False):
+        """Symptom x symptom counts of assessments reporting both (the diagonal: either alone)
+
+        With ``normalize`` each row is divided by its diagonal, giving
+        P(column symptom | row symptom).
+        """
+        counts = self.vector_counts(selection)
+        matrix = VECTOR_BITS.T @ (VECTOR_BITS * counts[:, None])
+        if normalize:
+            diagonal = np.diag(matrix).astype(np.float64)
+            matrix = np.divide(matrix, diagonal[:, None], out=np.zeros(matrix.shape), where=diagonal[:, None] > 0)
+        return pd.DataFrame(matrix, index=SYMPTOM_FIELDS, columns=SYMPTOM_FIELDS)
+
+    def symptom_burden(self, selection=None):
+        """Assessments by number of symptoms reported"""
+        counts = np.bincount(POPCOUNT, weights=self.vector_counts(selection), minlength=len(SYMPTOM_FIELDS) + 1)
+        return pd.Series(counts.astype(np.int64), name='assessments').rename_axis('symptoms')
+
+    def top_vectors(self, selection=None, n=10):
+        """The n most frequent symptom combinations"""
+        counts = self.vector_counts(selection)
+        top = [m for m in np.argsort(counts, kind='stable')[::-1][:n] if counts[m]]
+        return pd.DataFrame({
+            'symptoms': [', '.join(np.array(SYMPTOM_FIELDS)[VECTOR_BITS[m] == 1]) or '(none)' for m in top],
+            'assessments': counts[top],
+        })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Symptom statistics of a cohort of stored assessments")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--age', help="Age group, e.g. youth")
+    parser.add_argument('--gender')
+    parser.add_argument('--since', help="Earliest assessment date, e.g. 2024-01-01")
+    parser.add_argument('--until', help="Assessments before this date")
+    parser.add_argument('--with', dest='all_of', nargs='+', default=[], metavar='SYMPTOM',
+                        help="Only assessments reporting all of these symptoms")
+    parser.add_argument('--without', dest='none_of', nargs='+', default=[], metavar='SYMPTOM',
+                        help="Only assessments reporting none of these symptoms")
+    parser.add_argument('--conditional', action='store_true',
+                        help="Show co-occurrence as P(column | row) instead of counts")
+    args = parser.parse_args(argv)
+
+    try:
+        conn = create_connection(args.db)
+        try:
+            cohorts = CohortAnalytics.load(conn)
+        finally:
+            conn.close()
+        selection = cohorts.select(args.age, args.gender, args.since, args.until,
+                                   all_of=args.all_of, none_of=args.none_of)
+    except (Error, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"Cohort: {int(selection.sum())} of {len(cohorts)} assessments")
+    print("\nPrevalence:")
+    print(cohorts.prevalence(selection).round(3).to_string())
+    print("\nSymptoms reported:")
+    print(cohorts.symptom_burden(selection).to_string())
+    print("\nMost common combinations:")
+    print(cohorts.top_vectors(selection).to_string(index=False))
+    print("\nCo-occurrence:")
+    with pd.option_context('display.width', 250, 'display.max_columns', None):
+        print(cohorts.co_occurrence(selection, args.conditional).round(3).to_string())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+# compact_model.py - Offline forest compaction for the questionnaire input space
+#
+# Offline only: neither the app nor the scoring service loads the compact
+# artifact, since the lookup table already answers every questionnaire. The
+# tool reports how far the forest could shrink; a forest with no redundant
+# splits or trees (as the shipped model has) only gets narrower dtypes.
+
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from benchmark_inference import time_calls, summarize
+from forest_engine import FlatForest
+from model_artifact import FOREST_ARRAYS, ArrayLabelEncoder, write_arrays
+from predictor import MODEL_PATH, file_hash, load_model_package, enumerate_inputs, split_feature_names
+
+COMPACT_VERSION = 1
+COMPACT_SUFFIX = '.compact'
+
+# Leaf probability dtypes to try, smallest first. Sums of float16 values over
+# a forest are exact in float64, so the argmax checks on them are exact too.
+VALUE_DTYPES = [np.float16, np.float32, np.float64]
+
+def smallest_int_dtype(max_value):
+    """Smallest signed integer dtype that holds 0..max_value"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def prune_tree(forest, root, age_features, values, nodes):
+    """Rebuild one tree of a scaler-folded forest for 0/1 inputs
+
+    A split whose outcome is already fixed (its feature was tested higher up,
+    an age column is ruled out because another one is set, or the cutoff lies
+    outside [0, 1)) is replaced by the branch taken, and a split between two
+    leaves with equal probabilities becomes a leaf. Nodes are appended to
+    ``nodes`` as (feature, left, right, value), feature None for leaves;
+    returns the index of the new root.
+    """
+    def visit(node, known):
+        while forest.left[node] != node:
+            f = int(forest.feature[node])
+            cutoff = forest.threshold[node]
+            if f in known:
+                node = forest.left[node] if known[f] <= cutoff else forest.right[node]
+            elif cutoff < 0:
+                node = forest.right[node]
+            elif cutoff >= 1:
+                node = forest.left[node]
+            else:
+                break
+        else:
+            nodes.append((None, None, None, values[node]))
+            return len(nodes) - 1
+
+        left = visit(forest.left[node], {**known, f: 0})
+        known_right = {**known, f: 1}
+        if f in age_features:
+            known_right.update({a: 0 for a in age_features if a != f})
+        right = visit(forest.right[node], known_right)
+        if (right == left + 1 == len(nodes) - 1 and nodes[left][0] is None and nodes[right][0] is None
+                and np.array_equal(nodes[left][3], nodes[right][3])):
+            del nodes[right]
+            return left
+        nodes.append((f, left, right, values[node]))
+        return len(nodes) - 1
+
+    return visit(root, {})
+
+def pack_forest(trees, max_depth, value_dtype):
+    """Pack pruned trees [(nodes, root)] into a FlatForest with compact dtypes
+
+    Every kept split tests a 0/1 feature, so all thresholds are 0.5.
+    """
+    n_nodes = sum(len(nodes) for nodes, _ in trees)
+    index_dtype = smallest_int_dtype(n_nodes)
+    feature = np.zeros(n_nodes, dtype=np.uint8)
+    left = np.arange(n_nodes, dtype=index_dtype)
+    right = np.arange(n_nodes, dtype=index_dtype)
+    value = np.zeros((n_nodes, len(trees[0][0][0][3])), dtype=value_dtype)
+    roots = np.zeros(len(trees), dtype=index_dtype)
+
+    offset = 0
+    for t, (nodes, root) in enumerate(trees):
+        for i, (f, l, r, v) in enumerate(nodes):
+            if f is not None:
+                feature[offset + i] = f
+                left[offset + i] = offset + l
+                right[offset + i] = offset + r
+            value[offset + i] = v
+        roots[t] = offset + root
+        offset += len(nodes)
+    threshold = np.full(n_nodes, 0.5, dtype=np.float16)
+    return FlatForest(feature, threshold, left, right, value, roots, max_depth, input_dtype=np.float32)
+
+def compact_forest(raw_engine, feature_names, expected):
+    """Smallest forest whose argmax equals ``expected`` on every questionnaire
+
+    Trees are pruned for 0/1 inputs, leaf probabilities are stored in the
+    smallest dtype that keeps every argmax, and trees are dropped, largest
+    first, while no prediction changes (ties included: argmax keeps the first
+    of equal classes). Returns (forest, stats).
+    """
+    X = enumerate_inputs(feature_names).to_numpy(dtype=np.float64)
+    _, age_columns = split_feature_names(feature_names)
+    age_features = {feature_names.index(c) for c in age_columns}
+
+    for value_dtype in VALUE_DTYPES:
+        values = raw_engine.value.astype(value_dtype)
+        trees = []
+        for root in raw_engine.roots:
+            nodes = []
+            trees.append((nodes, prune_tree(raw_engine, int(root), age_features, values, nodes)))
+
+        # Per-tree probabilities for every input; with float16 values the sums are exact
+        pruned = pack_forest(trees, raw_engine.max_depth, value_dtype)
+        leaf_values = pruned.value[pruned.apply(X)].astype(np.float64)
+        total = leaf_values.sum(axis=1)
+        keep = np.ones(len(trees), dtype=bool)
+        if value_dtype is not np.float64 and np.array_equal(total.argmax(axis=1), expected):
+            for t in sorted(range(len(trees)), key=lambda t: -len(trees[t][0])):
+                candidate = total - leaf_values[:, t]
+                if keep.sum() > 1 and np.array_equal(candidate.argmax(axis=1), expected):
+                    total = candidate
+                    keep[t] = False
+
+        forest = pack_forest([tree for tree, k in zip(trees, keep) if k], raw_engine.max_depth, value_dtype)
+        if np.array_equal(forest.predict(X)[0], expected):
+            return forest, {
+                'trees_before': int(raw_engine.n_trees),
+                'trees_after': int(forest.n_trees),
+                'nodes_before': int(len(raw_engine.feature)),
+                'nodes_after': int(len(forest.feature)),
+                'value_dtype': np.dtype(value_dtype).name,
+                'index_dtype': forest.left.dtype.name,
+            }
+    raise ValueError("Could not compact the forest without changing a prediction")
+
+def engine_bytes(forest):
+    """Bytes of the arrays that make up a FlatForest"""
+    return int(sum(getattr(forest, name).nbytes for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots')))
+
+def path_bytes(path):
+    """Size of a file, or of all files in a directory"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+def compact_artifact_path(model_path):
+    """Compacted-forest artifact directory that sits next to a .pkl model package"""
+    return os.path.splitext(model_path)[0] + COMPACT_SUFFIX
+
+def save_compact_artifact(path, forest, model_package, model_hash=None, stats=None):
+    """Write a compacted forest with its labels, in the same layout as an artifact"""
+    meta = {
+        'version': COMPACT_VERSION,
+        'compact': True,
+        'model_hash': model_hash,
+        'max_depth': int(forest.max_depth),
+        'class_names': [str(c) for c in model_package['label_encoder'].classes_],
+        'feature_names': [str(c) for c in model_package['feature_names']],
+        'model_name': model_package.get('model_name'),
+        'accuracy': model_package.get('accuracy'),
+        'training_date': str(model_package.get('training_date', '')),
+        'compaction': stats or {},
+    }
+    write_arrays(path, {name: getattr(forest, name) for name in FOREST_ARRAYS}, meta)
+
+def load_compact_artifact(path, model_hash=None):
+    """Load a compacted forest as a model package for 0/1 questionnaire inputs
+
+    The forest replaces the scaler-folded raw engine, so predict_depression(),
+    explain_depression() and score_matrix() use it directly; its argmax equals
+    the full model's on every questionnaire, its probabilities are those of
+    the smaller forest. Returns None like load_artifact(). Only
+    main()'s self-check loads it; serving never does.
+    """
+    try:
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != COMPACT_VERSION or not meta.get('compact'):
+        return None
+    if model_hash is not None and meta.get('model_hash') != model_hash:
+        return None
+
+    try:
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy')) for name in FOREST_ARRAYS}
+    except (OSError, ValueError):
+        return None
+    # Widening is exact (0.5 and float16 values are representable), and the
+    # walk is faster on native dtypes than converting uint8/float16 every step
+    arrays['feature'] = arrays['feature'].astype(np.intp)
+    arrays['threshold'] = arrays['threshold'].astype(np.float32)
+    arrays['value'] = arrays['value'].astype(np.float64)
+    return {
+        'model': None,
+        'engine': None,
+        'raw_engine': FlatForest(max_depth=meta['max_depth'], input_dtype=np.float32, **arrays),
+        'scaler': None,
+        'label_encoder': ArrayLabelEncoder(np.array(meta['class_names'])),
+        'feature_names': meta['feature_names'],
+        'target_names': meta['class_names'],
+        'model_name': meta.get('model_name'),
+        'accuracy': meta.get('accuracy'),
+        'training_date': meta.get('training_date'),
+        'model_hash': meta.get('model_hash'),
+        'compaction': meta.get('compaction'),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact the RandomForest for the questionnaire input space")
+    parser.add_argument('model', nargs='?', default=MODEL_PATH, help="Model package (.pkl) to compact")
+    parser.add_argument('--output', help="Compact artifact directory (default: next to the model)")
+    parser.add_argument('--repeats', type=int, default=20, help="Timed calls per latency measurement")
+    parser.add_argument('--report', help="Also write the size/latency report as JSON here")
+    args = parser.parse_args(argv)
+
+    model_package = load_model_package(args.model, use_artifact=False)
+    raw_engine = model_package.get('raw_engine')
+    lookup_table = model_package.get('lookup_table')
+    if raw_engine is None or lookup_table is None:
+        print("❌ Only RandomForest model packages can be compacted")
+        return 1
+
+    feature_names = list(model_package['feature_names'])
+    expected = np.asarray(lookup_table.predicted).ravel()
+    try:
+        forest, stats = compact_forest(raw_engine, feature_names, expected)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    output = args.output or compact_artifact_path(args.model)
+    save_compact_artifact(output, forest, model_package, file_hash(args.model), stats)
+
+    # Check what was written, not what is in memory
+    compact_package = load_compact_artifact(output)
+    input_frame = enumerate_inputs(feature_names)
+    X = input_frame.to_numpy(dtype=np.float64)
+    if not np.array_equal(compact_package['raw_engine'].predict(X)[0], expected):
+        print("❌ Compacted artifact changes predictions; not using it")
+        return 1
+
+    X_scaled = model_package['scaler'].transform(input_frame)
+    compact_engine = compact_package['raw_engine']
+    latency = {}
+    for label, rows in (('single', slice(0, 1)), ('all_inputs', slice(None))):
+        latency[label] = {
+            'sklearn': summarize(time_calls(lambda: model_package['model'].predict_proba(X_scaled[rows]), args.repeats)),
+            'flat_forest': summarize(time_calls(lambda: raw_engine.predict(X[rows]), args.repeats)),
+            'compact': summarize(time_calls(lambda: compact_engine.predict(X[rows]), args.repeats)),
+        }
+    report = dict(stats, **{
+        'model_file_bytes': path_bytes(args.model),
+        'engine_bytes_before': engine_bytes(raw_engine),
+        'engine_bytes_after': engine_bytes(forest),
+        'compact_artifact_bytes': path_bytes(output),
+        'latency': latency,
+    })
+
+    if stats['trees_after'] == stats['trees_before'] and stats['nodes_after'] == stats['nodes_before']:
+        print("⚠️ No splits or trees could be removed; only the array dtypes were narrowed")
+    print(f"Trees: {stats['trees_before']} -> {stats['trees_after']}, "
+          f"nodes: {stats['nodes_before']} -> {stats['nodes_after']} "
+          f"(values {stats['value_dtype']}, indices {stats['index_dtype']})")
+    print(f"Size: model file {report['model_file_bytes']:,} bytes, forest arrays "
+          f"{report['engine_bytes_before']:,} -> {report['engine_bytes_after']:,} bytes, "
+          f"compact artifact {report['compact_artifact_bytes']:,} bytes")
+    for label, timings in latency.items():
+        print(f"Latency p50 ({label}): sklearn {timings['sklearn']['p50_ms']:.3f} ms, "
+              f"flat forest {timings['flat_forest']['p50_ms']:.3f} ms, "
+              f"compact {timings['compact']['p50_ms']:.3f} ms")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(f"✅ Compact artifact written to {os.path.abspath(output)}; "
+          f"argmax identical on all {len(expected)} questionnaires")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
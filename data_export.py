@@ -0,0 +1,188 @@
+# data_export.py - Streaming exports of database tables to compressed CSV or Parquet files
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+from sqlite3 import Error
+import pandas as pd
+from database import DB_PATH, SYMPTOM_COLUMNS, create_connection
+
+EXPORT_CHUNK_ROWS = 10000
+PREVIEW_ROWS = 100
+EXPORT_FORMATS = {'csv': '.csv.gz', 'parquet': '.parquet'}
+
+# Export files for download live here; ones from abandoned sessions are pruned
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'depression_exports')
+EXPORT_MAX_AGE = 3600
+EXPORT_MAX_FILES = 20
+# st.download_button holds the whole file in memory, so app downloads stop here;
+# larger exports go through this script's command line, which writes straight to disk
+EXPORT_MAX_BYTES = 100 * 1024 * 1024
+
+# Export name -> (label shown in the app, query); columns are listed so joins have no duplicate names
+EXPORTS = {
+    'predictions': ("All Predictions", f"""
+        SELECT pr.id AS prediction_id, pr.assessment_id, pr.patient_id, p.age_group, p.gender,
+               {', '.join(f's.{column}' for column in SYMPTOM_COLUMNS.values())},
+               pr.predicted_type, pr.confidence, pr.margin, pr.model_version, pr.confirmed_type, pr.timestamp
+        FROM predictions pr
+        JOIN patients p ON pr.patient_id = p.patient_id
+        JOIN symptoms s ON s.assessment_id = pr.assessment_id
+        ORDER BY pr.id
+    """),
+    'symptoms': ("Symptoms Data", "SELECT * FROM symptoms"),
+    'patients': ("Patient Demographics", "SELECT * FROM patients"),
+}
+
+def table_query(table_name):
+    """Query exporting a whole table or view"""
+    return f'SELECT * FROM "{table_name}"'
+
+def write_csv(chunks, output_path):
+    """Stream result chunks to a CSV file (gzip-compressed for .gz), writing the header once"""
+    rows = 0
+    opener = gzip.open if output_path.endswith('.gz') else open
+    with opener(output_path, 'wt', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=(i == 0))
+            rows += len(chunk)
+    return rows
+
+def write_parquet(chunks, output_path):
+    """Stream result chunks to a Parquet file, one row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer:
+            writer.close()
+    return rows
+
+def column_dtypes(conn, query):
+    """Pandas dtype of each result column, from the declared SQLite column types
+
+    Chunks get the same dtypes whatever values (or NULLs) they happen to
+    hold, so a Parquet file keeps one schema throughout.
+    """
+    conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS export_columns AS {query}")
+    try:
+        columns = conn.execute("PRAGMA table_info(export_columns)").fetchall()
+    finally:
+        conn.execute("DROP VIEW IF EXISTS temp.export_columns")
+    dtypes = {}
+    for _, name, declared, *_ in columns:
+        declared = declared.upper()
+        if 'INT' in declared:
+            dtypes[name] = 'Int64'
+        elif any(kind in declared for kind in ('REAL', 'FLOA', 'DOUB')):
+            dtypes[name] = 'Float64'
+        else:
+            dtypes[name] = 'string'
+    return dtypes
+
+def iter_query(conn, query, chunk_size=EXPORT_CHUNK_ROWS):
+    """Yield the query result as DataFrames of at most chunk_size rows with fixed dtypes"""
+    dtypes = column_dtypes(conn, query)
+    cursor = conn.cursor()
+    cursor.execute(query)
+    names = [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield pd.DataFrame(rows, columns=names).astype({name: dtypes.get(name, 'string') for name in names})
+
+def preview(conn, query, rows=PREVIEW_ROWS):
+    """The first rows of a query, for display"""
+    return pd.read_sql_query(f"SELECT * FROM ({query}) LIMIT ?", conn, params=(rows,))
+
+def count_rows(conn, query):
+    return conn.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()[0]
+
+def export_query(conn, query, output_path, output_format='csv', chunk_size=EXPORT_CHUNK_ROWS):
+    """Stream a query result to a gzip CSV or Parquet file; returns the row count"""
+    chunks = iter_query(conn, query, chunk_size)
+    if output_format == 'parquet':
+        return write_parquet(chunks, output_path)
+    return write_csv(chunks, output_path)
+
+def prune_exports(export_dir=EXPORT_DIR, max_age=EXPORT_MAX_AGE, max_files=EXPORT_MAX_FILES):
+    """Remove export files older than max_age seconds, and all but the newest max_files"""
+    try:
+        entries = sorted(os.scandir(export_dir), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    except FileNotFoundError:
+        return
+    now = time.time()
+    for i, entry in enumerate(entries):
+        if i >= max_files or now - entry.stat().st_mtime > max_age:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass  # Removed by another process, or still open on Windows
+
+def export_to_tempfile(conn, query, output_format='csv', chunk_size=EXPORT_CHUNK_ROWS,
+                       max_bytes=EXPORT_MAX_BYTES):
+    """Export to a new file in EXPORT_DIR for download; returns (path, rows)
+
+    Raises RuntimeError if the file comes out larger than max_bytes. The
+    caller may remove the file when done with it; files left behind by
+    abandoned sessions are pruned by later exports.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    prune_exports()
+    fd, path = tempfile.mkstemp(prefix='depression_export_', suffix=EXPORT_FORMATS[output_format],
+                                dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        rows = export_query(conn, query, path, output_format, chunk_size)
+        size = os.path.getsize(path)
+        if size > max_bytes:
+            raise RuntimeError(f"the file is {size / 2**20:.0f} MB, over the {max_bytes / 2**20:.0f} MB "
+                               "limit for downloads; run python data_export.py instead")
+        return path, rows
+    except Exception:
+        os.remove(path)
+        raise
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export database tables without loading them into memory")
+    parser.add_argument('export', help=f"One of {', '.join(EXPORTS)}, or any table name")
+    parser.add_argument('output', help="File to write (.csv.gz or .parquet)")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS),
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_ROWS, help="Rows fetched at a time")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'csv')
+    query = EXPORTS[args.export][1] if args.export in EXPORTS else table_query(args.export)
+    try:
+        conn = create_connection(args.db)
+        try:
+            rows = export_query(conn, query, args.output, output_format, args.chunk_size)
+        finally:
+            conn.close()
+    except (Error, OSError, RuntimeError) as e:
+        print(f"❌ Error exporting {args.export}: {e}")
+        return 1
+
+    print(f"✅ Exported {rows} rows -> {os.path.abspath(args.output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# database.py - SQLite access shared by the app, scripts and scoring service
+
+import ast
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+DB_PATH = 'depression_data.db'
+
+# Idle connections kept per database file and process
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+
+# WAL lets readers run alongside the writer; NORMAL sync is durable in WAL
+# mode except for the last commits on power loss (not on a process crash)
+CONNECTION_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA temp_store=MEMORY',
+]
+
+PRECAUTION_FIELDS = ['depression_type', 'immediate_actions', 'lifestyle_changes',
+                     'professional_help', 'emergency_contacts']
+
+# Model feature name -> symptoms table column
+SYMPTOM_COLUMNS = {
+    'Feelinghopeless': 'feeling_hopeless',
+    'lossofinterest': 'loss_of_interest',
+    'appetitechange': 'appetite_change',
+    'distrubedsleepcycle': 'disturbed_sleep',
+    'low energy': 'low_energy',
+    'lackofconcentration': 'lack_concentration',
+    'suicidalthoughts': 'suicidal_thoughts',
+    'temperoutburst': 'temper_outburst',
+    'panicattack': 'panic_attack',
+    'moodswing': 'mood_swing',
+    'medicalissue': 'medical_issue',
+}
+
+# Symptoms are stored as one bitmask per assessment: bit i is the i-th
+# SYMPTOM_COLUMNS entry, the same order as the model's lookup table
+SYMPTOM_VECTORS = 1 << len(SYMPTOM_COLUMNS)
+
+def symptom_mask(values):
+    """Bitmask of answers given in SYMPTOM_COLUMNS order; any non-zero answer is present"""
+    return sum(1 << bit for bit, value in enumerate(values) if value)
+
+def mask_bits(masks):
+    """0/1 matrix with one row per mask and one column per SYMPTOM_COLUMNS entry"""
+    masks = np.asarray(masks, dtype=np.int64)
+    return (masks[:, None] >> np.arange(len(SYMPTOM_COLUMNS))) & 1
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool"""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+class ConnectionPool:
+    """Reusable, pre-configured connections to one database file
+
+    Connections are created on demand and up to ``size`` idle ones are kept
+    for reuse. A connection is used by one thread at a time, but may move
+    between threads (Streamlit reruns, service request threads).
+    """
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Take an idle connection or open a new one (raises sqlite3.Error)"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, factory=PooledConnection)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        """Return a connection; work it did not commit is rolled back"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            sqlite3.Connection.close(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.size and conn not in self._idle:
+                self._idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=DB_PATH):
+    """The pool for a database file in this process (forked workers get their own)"""
+    key = (os.getpid(), os.path.abspath(db_path))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_path)
+        return _pools[key]
+
+def create_connection(db_path=DB_PATH):
+    """Connection to the depression database from the process pool (raises sqlite3.Error)
+
+    close() returns it to the pool.
+    """
+    return get_pool(db_path).connect()
+
+def ensure_column(conn, table, column, declaration):
+    """Add a column to an existing table if it is not there yet"""
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+# 'PDD': 0.25 as written by str() of a dict, also with numpy scalars (np.float64(0.25))
+PROBABILITY_ITEM = re.compile(r"'([^']+)':\s*(?:np\.float\d*\()?([-+\d.eE]+)")
+
+def parse_probabilities(value):
+    """Class probabilities from a dict or its str() as stored in older rows ({} if unreadable)"""
+    if isinstance(value, dict):
+        return {str(k): float(v) for k, v in value.items()}
+    if not value:
+        return {}
+    items = PROBABILITY_ITEM.findall(value)
+    if items:
+        return {k: float(v) for k, v in items}
+    try:
+        return {str(k): float(v) for k, v in ast.literal_eval(value).items()}
+    except (ValueError, SyntaxError, AttributeError, TypeError):
+        return {}
+
+def probability_margin(probabilities):
+    """Gap between the two most likely classes (None without probabilities)"""
+    top = sorted(probabilities.values(), reverse=True)[:2]
+    if not top:
+        return None
+    return top[0] - (top[1] if len(top) > 1 else 0.0)
+
+def fetch_precautions(conn, depression_type):
+    """Return the precautions row for a depression type as a dict, or None"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM precautions WHERE depression_type = ?", (depression_type,))
+    result = cursor.fetchone()
+    if result:
+        return dict(zip(PRECAUTION_FIELDS, result))
+    return None
+
+def confirm_diagnosis(conn, prediction_id, depression_type):
+    """Record the clinician-confirmed type of a prediction (a training label)"""
+    cursor = conn.cursor()
+    cursor.execute("UPDATE predictions SET confirmed_type = ? WHERE id = ?", (depression_type, prediction_id))
+    conn.commit()
+    return cursor.rowcount > 0
+
+def _expand_masks(frame, values=None):
+    """Replace the symptom_mask column with one column per model symptom feature"""
+    bits = mask_bits(frame['symptom_mask'].to_numpy())
+    symptoms = pd.DataFrame(bits if values is None else np.asarray(values)[bits],
+                            columns=list(SYMPTOM_COLUMNS), index=frame.index)
+    position = frame.columns.get_loc('symptom_mask')
+    return pd.concat([frame.iloc[:, :position], symptoms, frame.iloc[:, position + 1:]], axis=1)
+
+def iter_labelled_rows(conn, chunk_size=10000):
+    """Yield confirmed assessments as DataFrames in the training CSV layout (Y/N, Age, type)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT s.symptom_mask, p.age_group, pr.confirmed_type
+        FROM predictions pr
+        JOIN assessment_symptoms s ON s.assessment_id = pr.assessment_id
+        JOIN patients p ON p.patient_id = pr.patient_id
+        WHERE pr.confirmed_type IS NOT NULL
+    """)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield _expand_masks(pd.DataFrame(rows, columns=['symptom_mask', 'Age', 'type']), ['N', 'Y'])
+
+def iter_assessments(conn, chunk_size=10000, limit=None):
+    """Yield stored assessments with the prediction made at the time, as DataFrames
+
+    Columns: prediction_id, the model's symptom feature names (0/1), Age,
+    predicted_type and confidence. Only one chunk is held in Python at a
+    time. With ``limit`` only the newest assessments are returned, still
+    oldest first.
+    """
+    # The newest ids are picked first, then everything is read in id order
+    newest = "WHERE pr.id IN (SELECT id FROM predictions ORDER BY id DESC LIMIT ?)" if limit is not None else ""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT pr.id, s.symptom_mask, p.age_group, pr.predicted_type, pr.confidence
+        FROM predictions pr
+        JOIN assessment_symptoms s ON s.assessment_id = pr.assessment_id
+        LEFT JOIN patients p ON p.patient_id = pr.patient_id
+        {newest}
+        ORDER BY pr.id
+    """, () if limit is None else (limit,))
+    names = ['prediction_id', 'symptom_mask', 'Age', 'predicted_type', 'confidence']
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield _expand_masks(pd.DataFrame(rows, columns=names))
+
+def mean_probability_by_age(conn, depression_type):
+    """[(age_group, assessments, mean probability of depression_type)]"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.age_group, COUNT(*), AVG(pp.probability)
+        FROM prediction_probabilities pp
+        JOIN predictions pr ON pr.assessment_id = pp.assessment_id
+        JOIN patients p ON p.patient_id = pr.patient_id
+        WHERE pp.depression_type = ?
+        GROUP BY p.age_group
+        ORDER BY p.age_group
+    """, (depression_type,))
+    return cursor.fetchall()
+
+def low_margin_predictions(conn, max_margin, limit=50):
+    """Predictions whose top two classes are within max_margin, closest calls first"""
+    return pd.read_sql_query("""
+        SELECT id, patient_id, predicted_type, confidence, margin, timestamp
+        FROM predictions
+        WHERE margin <= ?
+        ORDER BY margin
+        LIMIT ?
+    """, conn, params=(max_margin, limit))
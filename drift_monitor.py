@@ -0,0 +1,239 @@
+# drift_monitor.py - Sliding-window drift of live questionnaires against the training data
+
+import argparse
+import sys
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from database import DB_PATH, create_connection, iter_assessments
+from predictor import MODEL_PATH, is_positive, split_feature_names, encode_frame
+
+DEFAULT_WINDOWS = (100, 1000)
+SMOOTHING = 1e-4
+
+# Usual PSI reading: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 major shift
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+
+def age_groups(feature_names):
+    """Age groups the model knows, plus 'other' for the rest (e.g. elderly)"""
+    _, age_columns = split_feature_names(feature_names)
+    return [column[len('Age_'):] for column in age_columns] + ['other']
+
+def build_reference_profile(X, w, feature_names, class_names, predicted):
+    """Symptom prevalence, age-group mix and predicted-class mix of the training rows
+
+    X holds raw 0/1 features in ``feature_names`` order, w the row counts
+    (None for one each) and predicted the model's class index for each row.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    w = np.ones(len(X)) if w is None else np.asarray(w, dtype=np.float64)
+    feature_names = list(feature_names)
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    symptoms = X[:, [feature_names.index(c) for c in symptom_columns]]
+    ages = X[:, [feature_names.index(c) for c in age_columns]]
+    age_codes = np.where(ages.any(axis=1), ages.argmax(axis=1), len(age_columns))
+    return {
+        'symptoms': symptom_columns,
+        'symptom_prevalence': (w @ symptoms / w.sum()).tolist(),
+        'age_groups': age_groups(feature_names),
+        'age_mix': (np.bincount(age_codes, weights=w, minlength=len(age_columns) + 1) / w.sum()).tolist(),
+        'classes': [str(c) for c in class_names],
+        'class_mix': (np.bincount(predicted, weights=w, minlength=len(class_names)) / w.sum()).tolist(),
+        'rows': int(w.sum()),
+    }
+
+def package_reference_profile(model_package, X, w=None):
+    """Reference profile of raw rows X, with the classes the package's model predicts for them"""
+    feature_names = list(model_package['feature_names'])
+    X_scaled = model_package['scaler'].transform(pd.DataFrame(X, columns=feature_names))
+    predicted = model_package['model'].predict(X_scaled)
+    return build_reference_profile(X, w, feature_names, model_package['label_encoder'].classes_, predicted)
+
+def psi(observed, expected):
+    """Population stability index between two distributions"""
+    p = np.asarray(observed, dtype=np.float64) + SMOOTHING
+    q = np.asarray(expected, dtype=np.float64) + SMOOTHING
+    p, q = p / p.sum(), q / q.sum()
+    return float(np.sum((p - q) * np.log(p / q)))
+
+def kl_divergence(observed, expected):
+    """KL(observed || expected)"""
+    p = np.asarray(observed, dtype=np.float64) + SMOOTHING
+    q = np.asarray(expected, dtype=np.float64) + SMOOTHING
+    p, q = p / p.sum(), q / q.sum()
+    return float(np.sum(p * np.log(p / q)))
+
+def drift_level(score):
+    if score >= PSI_MAJOR:
+        return 'major'
+    if score >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+class SlidingWindow:
+    """Counts over the last ``size`` assessments, kept in a ring buffer"""
+
+    def __init__(self, size, n_symptoms, n_ages, n_classes):
+        self.size = size
+        self.symptoms = np.zeros((size, n_symptoms), dtype=np.uint8)
+        self.ages = np.zeros(size, dtype=np.intp)
+        self.classes = np.zeros(size, dtype=np.intp)
+        self.symptom_counts = np.zeros(n_symptoms, dtype=np.int64)
+        self.age_counts = np.zeros(n_ages, dtype=np.int64)
+        self.class_counts = np.zeros(n_classes, dtype=np.int64)
+        self.count = 0
+        self.position = 0
+
+    def add(self, symptoms, age, predicted):
+        if self.count == self.size:
+            # The slot being overwritten holds the oldest assessment
+            self.symptom_counts -= self.symptoms[self.position]
+            self.age_counts[self.ages[self.position]] -= 1
+            self.class_counts[self.classes[self.position]] -= 1
+        else:
+            self.count += 1
+        self.symptoms[self.position] = symptoms
+        self.ages[self.position] = age
+        self.classes[self.position] = predicted
+        self.symptom_counts += symptoms
+        self.age_counts[age] += 1
+        self.class_counts[predicted] += 1
+        self.position = (self.position + 1) % self.size
+
+class DriftMonitor:
+    """Live symptom prevalence, age mix and predicted-class mix over sliding windows
+
+    observe() costs the same however many assessments have been seen, and
+    memory is fixed by the window sizes. Safe to share between sessions.
+    """
+
+    def __init__(self, feature_names, class_names, windows=DEFAULT_WINDOWS):
+        self.symptoms, _ = split_feature_names(list(feature_names))
+        self.age_groups = age_groups(feature_names)
+        self.classes = [str(c) for c in class_names]
+        self._age_index = {age: i for i, age in enumerate(self.age_groups[:-1])}
+        self._class_index = {c: i for i, c in enumerate(self.classes)}
+        self.windows = [SlidingWindow(size, len(self.symptoms), len(self.age_groups), len(self.classes))
+                        for size in sorted(windows)]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, model_package, windows=DEFAULT_WINDOWS):
+        return cls(model_package['feature_names'], model_package['label_encoder'].classes_, windows)
+
+    def observe(self, symptoms_dict, prediction):
+        """Add one assessment; predictions outside the model's classes are ignored"""
+        predicted = self._class_index.get(str(prediction))
+        if predicted is None:
+            return
+        symptoms = np.array([is_positive(symptoms_dict.get(s, 0)) for s in self.symptoms], dtype=np.uint8)
+        age = self._age_index.get(str(symptoms_dict.get('Age')), len(self.age_groups) - 1)
+        with self._lock:
+            for window in self.windows:
+                window.add(symptoms, age, predicted)
+
+    def load_recent(self, conn):
+        """Fill the windows from the newest stored assessments (e.g. after a restart)"""
+        limit = self.windows[-1].size
+        feature_names = self.symptoms + [f'Age_{age}' for age in self.age_groups[:-1]]
+        # One chunk of at most ``limit`` rows, oldest first
+        for chunk in iter_assessments(conn, limit, limit=limit):
+            X, age_codes = encode_frame(chunk, feature_names)
+            symptoms = X[:, :len(self.symptoms)].astype(np.uint8)
+            with self._lock:
+                for row, age, prediction in zip(symptoms, age_codes, chunk['predicted_type'].astype(str)):
+                    predicted = self._class_index.get(prediction)
+                    if predicted is not None:
+                        for window in self.windows:
+                            window.add(row, age, predicted)
+        return self
+
+    def scores(self, reference_profile):
+        """PSI and KL of each window against a reference profile, one row per window"""
+        if reference_profile['symptoms'] != self.symptoms or reference_profile['classes'] != self.classes:
+            raise ValueError("Reference profile was built for different features or classes")
+        rows = []
+        with self._lock:
+            for window in self.windows:
+                if not window.count:
+                    continue
+                prevalence = window.symptom_counts / window.count
+                symptom_psi = [psi([p, 1 - p], [r, 1 - r])
+                               for p, r in zip(prevalence, reference_profile['symptom_prevalence'])]
+                worst = int(np.argmax(symptom_psi))
+                age_mix = window.age_counts / window.count
+                class_mix = window.class_counts / window.count
+                rows.append({
+                    'window': window.size,
+                    'assessments': window.count,
+                    'symptom_psi_max': symptom_psi[worst],
+                    'most_shifted_symptom': self.symptoms[worst],
+                    'age_psi': psi(age_mix, reference_profile['age_mix']),
+                    'age_kl': kl_divergence(age_mix, reference_profile['age_mix']),
+                    'class_psi': psi(class_mix, reference_profile['class_mix']),
+                    'class_kl': kl_divergence(class_mix, reference_profile['class_mix']),
+                    'symptom_prevalence': dict(zip(self.symptoms, prevalence.tolist())),
+                    'symptom_psi': dict(zip(self.symptoms, symptom_psi)),
+                })
+        return rows
+
+def profile_from_csv(model_package, data_path):
+    """Reference profile of a training CSV (Y/N symptoms and 'Age'), read in chunks"""
+    feature_names = list(model_package['feature_names'])
+    counts = None
+    for chunk in pd.read_csv(data_path, chunksize=100000):
+        X, _ = encode_frame(chunk, feature_names)
+        rows = pd.DataFrame(X).value_counts()
+        counts = rows if counts is None else counts.add(rows, fill_value=0)
+    X = np.array(counts.index.tolist(), dtype=np.float64)
+    return package_reference_profile(model_package, X, counts.to_numpy())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Input drift of stored assessments against the training data")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    profile_cmd = commands.add_parser('profile', help="Save a training data reference profile in a model package")
+    profile_cmd.add_argument('data', help="Training CSV with Y/N symptom columns and 'Age'")
+    profile_cmd.add_argument('--model', default=MODEL_PATH, help="Model package to add the profile to")
+
+    report_cmd = commands.add_parser('report', help="Drift of the newest stored assessments")
+    report_cmd.add_argument('--model', default=MODEL_PATH, help="Model package with a reference profile")
+    report_cmd.add_argument('--db', default=DB_PATH)
+    report_cmd.add_argument('--windows', type=int, nargs='+', default=list(DEFAULT_WINDOWS))
+    args = parser.parse_args(argv)
+
+    try:
+        model_package = joblib.load(args.model)
+    except FileNotFoundError:
+        print(f"❌ Model file not found: {args.model}")
+        return 1
+
+    if args.command == 'profile':
+        model_package['reference_profile'] = profile_from_csv(model_package, args.data)
+        joblib.dump(model_package, args.model)
+        print(f"✅ Reference profile of {model_package['reference_profile']['rows']} rows saved in {args.model}")
+        return 0
+
+    profile = model_package.get('reference_profile')
+    if profile is None:
+        print(f"❌ {args.model} has no reference profile; run: python drift_monitor.py profile <training.csv>")
+        return 1
+    monitor = DriftMonitor.for_model(model_package, args.windows)
+    conn = create_connection(args.db)
+    try:
+        monitor.load_recent(conn)
+    finally:
+        conn.close()
+    for row in monitor.scores(profile):
+        print(f"Last {row['assessments']} assessments: "
+              f"symptom PSI {row['symptom_psi_max']:.3f} ({row['most_shifted_symptom']}, "
+              f"{drift_level(row['symptom_psi_max'])}), "
+              f"age PSI {row['age_psi']:.3f} ({drift_level(row['age_psi'])}), "
+              f"class PSI {row['class_psi']:.3f} ({drift_level(row['class_psi'])}), "
+              f"class KL {row['class_kl']:.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
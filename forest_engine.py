@@ -0,0 +1,298 @@
+# forest_engine.py - Pure-NumPy inference for the trained RandomForest
+
+from operator import add
+import numpy as np
+
+SIGN_BIT = np.int64(-2**63)
+
+# From this many rows on, walking one tree at a time over all samples keeps
+# the working set smaller and beats walking every tree in lock step
+BY_TREE_MIN_ROWS = 4096
+
+def _float_to_key(x):
+    """Map float64 values to int64 keys with the same ordering"""
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & ~SIGN_BIT), bits)
+
+def _key_to_float(key):
+    """Inverse of _float_to_key"""
+    return np.where(key < 0, (-key) | SIGN_BIT, key).view(np.float64)
+
+class FlatForest:
+    """All trees of a RandomForest packed into contiguous node arrays
+
+    Node arrays are concatenated tree after tree. Leaves point to themselves
+    on both sides, so every sample can be walked through every tree in lock
+    step for ``max_depth`` steps without branching on leaf status.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 input_dtype=np.float32):
+        # Plain ndarray views of memory-mapped arrays: np.memmap adds overhead to every take
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left)
+        self.right = np.asarray(right)
+        self.value = np.asarray(value)
+        self.roots = np.asarray(roots)
+        self.max_depth = max_depth
+        self.input_dtype = input_dtype
+        self.n_trees = len(roots)
+        # children[2 * node + go_left] is the next node
+        self.children = np.stack([right, left], axis=1).ravel().astype(np.intp)
+        self.n_classes = value.shape[1]
+        self._gain_bounds = None
+        self._anytime = None
+
+    @classmethod
+    def from_model(cls, model):
+        """Flatten a fitted sklearn RandomForestClassifier"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Same per-tree normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :model.n_classes_].copy()
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(value)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+        )
+
+    def fold_scaler(self, mean, scale):
+        """Return a copy whose thresholds act on raw float64 features
+
+        sklearn tests float32((x - mean) / scale) <= t. With a positive scale
+        that is monotone in x, so each split has a raw cutoff c with the same
+        outcome as x <= c for every float64 x. c lies close to t * scale + mean
+        and is pinned down exactly by bisecting over the float64 values around
+        it. Returns None if a cutoff cannot be bracketed.
+        """
+        internal = self.left != np.arange(len(self.left))
+        t = self.threshold[internal]
+        m = mean[self.feature[internal]]
+        s = scale[self.feature[internal]]
+
+        def goes_left(x):
+            return ((x - m) / s).astype(np.float32) <= t
+
+        approx = t * s + m
+        delta = (np.abs(approx) + s * (np.abs(t) + 1.0)) * 1e-5
+        lo = _float_to_key(approx - delta)
+        hi = _float_to_key(approx + delta)
+        if not goes_left(_key_to_float(lo)).all() or goes_left(_key_to_float(hi)).any():
+            return None
+        while (hi - lo > 1).any():
+            mid = lo + (hi - lo) // 2
+            left = goes_left(_key_to_float(mid))
+            lo = np.where(left, mid, lo)
+            hi = np.where(left, hi, mid)
+
+        threshold = np.array(self.threshold, dtype=np.float64)
+        threshold[internal] = _key_to_float(lo)
+        return FlatForest(self.feature, threshold, self.left, self.right,
+                          self.value, self.roots, self.max_depth, input_dtype=np.float64)
+
+    def apply(self, X, roots=None):
+        """Return the leaf index reached in every tree (or in ``roots``), shape (n_samples, n_trees)"""
+        # sklearn trees compare float32 inputs against float64 thresholds;
+        # scaler-folded forests compare the raw float64 inputs instead
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        row_offset = (np.arange(n_samples) * n_features)[:, np.newaxis]
+        roots = self.roots if roots is None else roots
+        node = np.repeat(np.asarray(roots, dtype=np.intp)[np.newaxis, :], n_samples, axis=0)
+        for _ in range(self.max_depth):
+            go_left = X_flat.take(row_offset + self.feature.take(node)) <= self.threshold.take(node)
+            node = self.children.take(2 * node + go_left)
+        return node
+
+    def contributions(self, X):
+        """Per-feature contributions to the class probabilities (tree path decomposition)
+
+        Every split credits its feature with the change in class distribution
+        between the node and the child taken. Returns (bias, contributions) of
+        shapes (n_samples, n_classes) and (n_samples, n_features, n_classes);
+        bias + contributions.sum(axis=1) equals predict_proba(X) up to rounding.
+        """
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        row_offset = (np.arange(n_samples) * n_features)[:, np.newaxis]
+        node = np.repeat(np.asarray(self.roots, dtype=np.intp)[np.newaxis, :], n_samples, axis=0)
+
+        totals = np.zeros((self.n_classes, n_samples * n_features))
+        for _ in range(self.max_depth):
+            slot = row_offset + self.feature.take(node)
+            go_left = X_flat.take(slot) <= self.threshold.take(node)
+            child = self.children.take(2 * node + go_left)
+            # Leaves point to themselves, so they add zero
+            delta = self.value[child] - self.value[node]
+            for k in range(self.n_classes):
+                totals[k] += np.bincount(slot.ravel(), weights=delta[..., k].ravel(),
+                                         minlength=n_samples * n_features)
+            node = child
+
+        contributions = totals.T.reshape(n_samples, n_features, self.n_classes) / self.n_trees
+        bias = np.broadcast_to(self.value[self.roots].sum(axis=0) / self.n_trees,
+                               (n_samples, self.n_classes))
+        return bias, contributions
+
+    def _predict_proba_by_tree(self, X):
+        """predict_proba for large batches: every sample through one tree at a time"""
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        row_offset = np.arange(n_samples) * n_features
+        proba = np.zeros((n_samples, self.n_classes))
+        for root in self.roots:
+            node = np.full(n_samples, root, dtype=np.intp)
+            for _ in range(self.max_depth):
+                go_left = X_flat.take(row_offset + self.feature.take(node)) <= self.threshold.take(node)
+                node = self.children.take(2 * node + go_left)
+            proba += self.value[node]
+        proba /= self.n_trees
+        return proba
+
+    def predict_proba(self, X):
+        """Class probabilities averaged over all trees, shape (n_samples, n_classes)"""
+        if len(X) >= BY_TREE_MIN_ROWS:
+            return self._predict_proba_by_tree(X)
+        leaf_values = self.value[self.apply(X)]
+        # Accumulate tree by tree, in estimator order, exactly as sklearn does
+        proba = np.zeros((leaf_values.shape[0], self.n_classes))
+        for t in range(self.n_trees):
+            proba += leaf_values[:, t]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """Return (class indices, confidences, probabilities) from a single pass"""
+        proba = self.predict_proba(X)
+        predicted = proba.argmax(axis=1)
+        confidence = proba[np.arange(len(predicted)), predicted]
+        return predicted, confidence, proba
+
+    def gain_bounds(self):
+        """bounds[t, j, k]: the most class k can gain on class j over trees t..n_trees-1
+
+        Per tree that is the largest value[leaf, k] - value[leaf, j] over its
+        leaves; bounds[n_trees] is zero.
+        """
+        if self._gain_bounds is None:
+            per_tree = np.zeros((self.n_trees + 1, self.n_classes, self.n_classes))
+            for t, root in enumerate(self.roots):
+                leaves, stack = [], [int(root)]
+                while stack:
+                    node = stack.pop()
+                    if self.left[node] == node:
+                        leaves.append(node)
+                    else:
+                        stack.extend((int(self.left[node]), int(self.right[node])))
+                values = np.asarray(self.value[leaves], dtype=np.float64)
+                per_tree[t] = (values[:, np.newaxis, :] - values[:, :, np.newaxis]).max(axis=0)
+            self._gain_bounds = np.cumsum(per_tree[::-1], axis=0)[::-1]
+        return self._gain_bounds
+
+    def _anytime_tables(self):
+        """Python lists for the scalar walk of predict_anytime(), built once"""
+        if self._anytime is None:
+            bounds = self.gain_bounds()
+            # The final sum is rounded tree by tree; keep a margin above that noise
+            catch = bounds.max(axis=2) + 1e-9 * self.n_trees
+            catch_min = catch.min(axis=1)
+            # No tree adds more to one class's lead than its widest leaf
+            per_tree = float((self.value.max(axis=1) - self.value.min(axis=1)).max())
+            possible = np.flatnonzero(np.arange(self.n_trees + 1) * per_tree > catch_min)
+            earliest = int(possible[0]) if len(possible) else self.n_trees
+            if self.n_classes < 2:
+                earliest = self.n_trees + 1  # Nothing to decide
+            self._anytime = (self.feature.tolist(), self.threshold.tolist(), self.left.tolist(),
+                             self.right.tolist(), self.value.tolist(), (self.value ** 2).tolist(),
+                             self.roots.tolist(), catch.tolist(), catch_min.tolist(), max(earliest, 1))
+        return self._anytime
+
+    def predict_anytime(self, x, tolerance=None, z=1.96):
+        """Score one sample tree by tree and stop at the first tree after which the vote is decided
+
+        Trees are walked in estimator order as plain Python scalars, which for
+        a single sample is cheaper than the vectorized pass over all trees.
+        After each tree the leader is final if its lead over the runner-up
+        exceeds the most any other class could still gain on it, even if every
+        remaining tree favoured that class as much as any of its leaves could
+        (checked only from the first tree where that is possible). With
+        ``tolerance`` it also stops once the z-interval of the leader's mean
+        probability (over trees, finite-population corrected) is no wider than
+        +/- tolerance; that stop may change the argmax.
+
+        Returns (predicted, confidence, proba, trees_used); proba averages the
+        trees used and equals predict_proba() when all of them were needed.
+        """
+        feature, threshold, left, right, value, squared, roots, catch, catch_min, earliest = \
+            self._anytime_tables()
+        x = np.asarray(x, dtype=self.input_dtype).ravel().tolist()
+        n_trees = self.n_trees
+        if tolerance is not None:
+            # z * sqrt(variance / used * (n_trees - used) / (n_trees - 1)) <= tolerance, without the root
+            limit = (tolerance / z) ** 2 * max(n_trees - 1, 1)
+        total = [0.0] * self.n_classes
+        squares = [0.0] * self.n_classes
+        used = 0
+        for root in roots:
+            node = root
+            while left[node] != node:
+                node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+            # Added in estimator order, as predict_proba() does
+            total = list(map(add, total, value[node]))
+            used += 1
+            if tolerance is not None:
+                squares = list(map(add, squares, squared[node]))
+                if used > 1:
+                    top = max(total)
+                    spread = squares[total.index(top)] - top * top / used
+                    if spread * (n_trees - used) <= limit * used * (used - 1):
+                        break
+            if used >= earliest:
+                ranked = sorted(total)
+                lead = ranked[-1] - ranked[-2]
+                if lead > catch_min[used] and lead > catch[used][total.index(ranked[-1])]:
+                    break
+
+        proba = np.array(total) / used
+        predicted = int(proba.argmax())
+        return predicted, proba[predicted], proba, used
+
+def flatten_model(model):
+    """Return a FlatForest for a fitted random or extra-trees forest, or None for other models
+
+    Other ensembles (gradient boosting, bagged trees) also carry estimators_
+    with tree_, but do not average normalised leaf distributions.
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    if not isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        return None
+    if not hasattr(model, 'estimators_'):
+        return None
+    return FlatForest.from_model(model)
@@ -0,0 +1,361 @@
+# migrations.py - Versioned schema migrations for the depression database
+
+import argparse
+import sys
+from sqlite3 import Error
+from database import DB_PATH, SYMPTOM_COLUMNS, SYMPTOM_VECTORS, create_connection, ensure_column, mask_bits
+from database import parse_probabilities, probability_margin
+from summary_stats import create_summary_tables, create_mask_triggers
+
+BACKFILL_CHUNK_ROWS = 10000
+
+PRECAUTIONS_DATA = [
+    ('Clinical Depression',
+     'Consult a psychiatrist immediately, Start therapy sessions, Consider medication if prescribed',
+     'Regular exercise, Balanced diet, Consistent sleep schedule, Mindfulness meditation',
+     'Cognitive Behavioral Therapy (CBT), Psychiatrist consultation, Support groups',
+     'National Suicide Prevention Lifeline: 1-800-273-TALK, Crisis Text Line: Text HOME to 741741'),
+
+    ('PDD',
+     'Schedule regular therapy sessions, Monitor symptom patterns, Keep a mood journal',
+     'Establish daily routine, Social engagement activities, Stress management techniques',
+     'Long-term psychotherapy, Regular psychiatric follow-ups, Group therapy',
+     'Therapist contact info, Trusted family member, Local mental health services'),
+
+    ('Medical Depression',
+     'Consult with primary physician, Review current medications, Address underlying medical conditions',
+     'Manage underlying health condition, Regular medical checkups, Medication adherence',
+     'Collaborative care with physicians, Psychiatrist for comorbid conditions',
+     'Primary care physician, Emergency medical services: 911'),
+
+    ('DMDD',
+     'Behavioral therapy for children, Parent management training, School intervention if needed',
+     'Consistent daily structure, Clear behavioral expectations, Positive reinforcement',
+     'Child psychologist, Family therapy, School counselor involvement',
+     'Pediatrician, Child mental health services, School counselor'),
+
+    ('PMDD',
+     'Track menstrual cycle symptoms, Consult gynecologist, Consider hormonal treatment',
+     'Dietary changes (reduce salt/caffeine), Regular exercise, Stress reduction techniques',
+     'Gynecologist consultation, Psychiatrist for symptom management',
+     'Gynecologist contact, Women\'s health clinic, Local support groups')
+]
+
+def create_base_schema(conn):
+    """Patients, symptoms, predictions and the pre-populated precautions table"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT UNIQUE,
+        age_group TEXT,
+        gender TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS symptoms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        feeling_hopeless INTEGER,
+        loss_of_interest INTEGER,
+        appetite_change INTEGER,
+        disturbed_sleep INTEGER,
+        low_energy INTEGER,
+        lack_concentration INTEGER,
+        suicidal_thoughts INTEGER,
+        temper_outburst INTEGER,
+        panic_attack INTEGER,
+        mood_swing INTEGER,
+        medical_issue INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        predicted_type TEXT,
+        confidence REAL,
+        probabilities TEXT,
+        model_version TEXT,
+        confirmed_type TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+    )
+    ''')
+
+    # Databases created before model versioning / diagnosis confirmation lack these columns
+    ensure_column(conn, 'predictions', 'model_version', 'TEXT')
+    ensure_column(conn, 'predictions', 'confirmed_type', 'TEXT')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS precautions (
+        depression_type TEXT PRIMARY KEY,
+        immediate_actions TEXT,
+        lifestyle_changes TEXT,
+        professional_help TEXT,
+        emergency_contacts TEXT
+    )
+    ''')
+
+    cursor.execute("SELECT COUNT(*) FROM precautions")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany('''
+        INSERT OR REPLACE INTO precautions
+        (depression_type, immediate_actions, lifestyle_changes, professional_help, emergency_contacts)
+        VALUES (?, ?, ?, ?, ?)
+        ''', PRECAUTIONS_DATA)
+
+def create_writer_checkpoint(conn):
+    """Last spilled record the background assessment writer has committed"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS writer_checkpoint (
+        spill_file TEXT PRIMARY KEY,
+        last_seq INTEGER
+    )
+    ''')
+
+def add_assessments(conn):
+    """One assessments row per questionnaire, referenced by its symptoms and predictions rows
+
+    Existing predictions become assessments with the same id. Symptoms rows
+    were only linked by patient_id; the n-th symptoms row of a patient is
+    paired with the patient's n-th prediction, as both were written together.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS assessments (
+        id INTEGER PRIMARY KEY,
+        patient_id TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    ensure_column(conn, 'symptoms', 'assessment_id', 'INTEGER REFERENCES assessments (id)')
+    ensure_column(conn, 'predictions', 'assessment_id', 'INTEGER REFERENCES assessments (id)')
+
+    cursor.execute('''
+    INSERT INTO assessments (id, patient_id, timestamp)
+    SELECT id, patient_id, timestamp FROM predictions WHERE assessment_id IS NULL
+    ''')
+    cursor.execute("UPDATE predictions SET assessment_id = id WHERE assessment_id IS NULL")
+    cursor.execute('''
+    UPDATE symptoms SET assessment_id = paired.prediction_id
+    FROM (
+        SELECT s.id AS symptom_id, pr.id AS prediction_id
+        FROM (SELECT id, patient_id, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id) AS n
+              FROM symptoms) s
+        JOIN (SELECT id, patient_id, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id) AS n
+              FROM predictions) pr
+          ON pr.patient_id = s.patient_id AND pr.n = s.n
+    ) AS paired
+    WHERE symptoms.id = paired.symptom_id AND symptoms.assessment_id IS NULL
+    ''')
+
+def add_indexes(conn):
+    """Indexes for the assessment links, patient lookups and recent-first listings"""
+    for statement in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_symptoms_assessment ON symptoms (assessment_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_assessment ON predictions (assessment_id)",
+        "CREATE INDEX IF NOT EXISTS idx_symptoms_patient ON symptoms (patient_id)",
+        "CREATE INDEX IF NOT EXISTS idx_predictions_patient ON predictions (patient_id)",
+        "CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_assessments_patient ON assessments (patient_id)",
+    ):
+        conn.execute(statement)
+
+def add_probability_table(conn):
+    """One row per class probability, and the gap between the top two classes of each prediction
+
+    Probabilities used to be stored as the str() of a dict; existing rows
+    are parsed a chunk at a time, in id order.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS prediction_probabilities (
+        assessment_id INTEGER REFERENCES assessments (id),
+        depression_type TEXT,
+        probability REAL,
+        PRIMARY KEY (assessment_id, depression_type)
+    ) WITHOUT ROWID
+    ''')
+    ensure_column(conn, 'predictions', 'margin', 'REAL')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS prediction_probabilities_delete AFTER DELETE ON predictions
+    BEGIN
+        DELETE FROM prediction_probabilities WHERE assessment_id = OLD.assessment_id;
+    END
+    ''')
+
+    last_id = 0
+    while True:
+        cursor.execute('''
+        SELECT id, assessment_id, probabilities FROM predictions
+        WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, BACKFILL_CHUNK_ROWS))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        parsed = [(prediction_id, assessment_id, parse_probabilities(text))
+                  for prediction_id, assessment_id, text in rows]
+        cursor.executemany('''
+        INSERT OR IGNORE INTO prediction_probabilities (assessment_id, depression_type, probability)
+        VALUES (?, ?, ?)
+        ''', [(a, t, p) for _, a, probabilities in parsed for t, p in probabilities.items()])
+        cursor.executemany("UPDATE predictions SET margin = ? WHERE id = ?",
+                           [(probability_margin(probabilities), prediction_id)
+                            for prediction_id, _, probabilities in parsed if probabilities])
+
+    # Rows of one type come out in assessment order, so joins to predictions read it sequentially
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_probabilities_type
+    ON prediction_probabilities (depression_type, assessment_id, probability)
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_margin ON predictions (margin)")
+
+def add_symptom_masks(conn):
+    """Store each assessment's symptoms as one bitmask, with a symptoms view for existing readers
+
+    assessment_symptoms replaces the symptoms table; bit i of symptom_mask
+    is the i-th SYMPTOM_COLUMNS column (any non-zero answer counts as
+    present, a missing one as absent). symptom_vectors spells out every mask, and the symptoms view
+    joins the two back into the old columns, inserts and deletes included.
+    """
+    fields = list(SYMPTOM_COLUMNS.values())
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS symptom_vectors (
+        symptom_mask INTEGER PRIMARY KEY,
+        {', '.join(f"{c} INTEGER NOT NULL" for c in fields)},
+        symptom_count INTEGER NOT NULL
+    )
+    ''')
+    bits = mask_bits(range(SYMPTOM_VECTORS))
+    cursor.executemany(f'''
+    INSERT OR IGNORE INTO symptom_vectors (symptom_mask, {', '.join(fields)}, symptom_count)
+    VALUES ({', '.join('?' * (len(fields) + 2))})
+    ''', [(mask, *row, sum(row)) for mask, row in enumerate(bits.tolist())])
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS assessment_symptoms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        assessment_id INTEGER REFERENCES assessments (id),
+        patient_id TEXT,
+        symptom_mask INTEGER NOT NULL REFERENCES symptom_vectors (symptom_mask),
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+    )
+    ''')
+    cursor.execute(f'''
+    INSERT INTO assessment_symptoms (id, assessment_id, patient_id, symptom_mask, timestamp)
+    SELECT id, assessment_id, patient_id,
+           {' | '.join(f"((COALESCE({c}, 0) != 0) << {bit})" for bit, c in enumerate(fields))},
+           timestamp
+    FROM symptoms
+    ''')
+    # Takes the table's indexes and statistics triggers with it
+    cursor.execute("DROP TABLE symptoms")
+
+    cursor.execute(f'''
+    CREATE VIEW symptoms AS
+    SELECT s.id, s.patient_id, {', '.join(f"v.{c}" for c in fields)}, s.timestamp, s.assessment_id
+    FROM assessment_symptoms s
+    JOIN symptom_vectors v ON v.symptom_mask = s.symptom_mask
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER symptoms_insert INSTEAD OF INSERT ON symptoms
+    BEGIN
+        INSERT INTO assessment_symptoms (id, assessment_id, patient_id, symptom_mask, timestamp)
+        VALUES (NEW.id, NEW.assessment_id, NEW.patient_id,
+                {' | '.join(f"((COALESCE(NEW.{c}, 0) != 0) << {bit})" for bit, c in enumerate(fields))},
+                COALESCE(NEW.timestamp, CURRENT_TIMESTAMP));
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER symptoms_delete INSTEAD OF DELETE ON symptoms
+    BEGIN
+        DELETE FROM assessment_symptoms WHERE id = OLD.id;
+    END
+    ''')
+
+    for statement in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_assessment_symptoms_assessment ON assessment_symptoms (assessment_id)",
+        "CREATE INDEX IF NOT EXISTS idx_assessment_symptoms_patient ON assessment_symptoms (patient_id)",
+    ):
+        cursor.execute(statement)
+    create_mask_triggers(conn)
+
+# (version, description, function); append only, never edit an applied migration
+MIGRATIONS = [
+    (1, "base schema", create_base_schema),
+    (2, "assessment writer checkpoint", create_writer_checkpoint),
+    (3, "assessment ids", add_assessments),
+    (4, "indexes", add_indexes),
+    (5, "statistics summary tables", create_summary_tables),
+    (6, "per-class probabilities", add_probability_table),
+    (7, "symptom bitmasks", add_symptom_masks),
+]
+
+def schema_version(conn):
+    """The last migration applied to a database (0 for a new or pre-migration one)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, target=None):
+    """Apply pending migrations, each in its own transaction; returns [(version, description)]
+
+    The version is re-read after taking the write lock, so processes
+    starting together apply each migration once.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for version, description, upgrade in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version > schema_version(conn):
+                upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied.append((version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upgrade the depression database schema in place")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database to upgrade")
+    parser.add_argument('--target', type=int, help="Stop at this schema version")
+    parser.add_argument('--status', action='store_true', help="Only show the schema version")
+    args = parser.parse_args(argv)
+
+    try:
+        conn = create_connection(args.db)
+        try:
+            version = schema_version(conn)
+            latest = MIGRATIONS[-1][0]
+            if args.status:
+                print(f"Schema version {version} (latest {latest})")
+                return 0
+            applied = migrate(conn, args.target)
+        finally:
+            conn.close()
+    except Error as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+
+    for version, description in applied:
+        print(f"Applied migration {version}: {description}")
+    print(f"✅ {args.db} is at schema version {applied[-1][0] if applied else version}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# model_artifact.py - Memory-mappable model artifact (plain .npy arrays + JSON)
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from forest_engine import FlatForest
+
+ARTIFACT_VERSION = 3
+ARTIFACT_SUFFIX = '.mmap'
+FOREST_ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+# Distributions of the drift monitor's reference profile, stored as profile_<name>.npy
+PROFILE_ARRAYS = ['symptom_prevalence', 'age_mix', 'class_mix']
+PROFILE_LABELS = ['symptoms', 'age_groups', 'classes', 'rows']
+
+class ArrayScaler:
+    """StandardScaler.transform() from stored mean/scale arrays"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+class ArrayLabelEncoder:
+    """LabelEncoder.inverse_transform() from the stored class names"""
+
+    def __init__(self, classes):
+        self.classes_ = classes
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y, dtype=np.intp)]
+
+def scaler_arrays(scaler, n_features):
+    """Return (mean, scale) of a fitted StandardScaler, filling in disabled steps"""
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    if mean is None:
+        mean = np.zeros(n_features)
+    if scale is None:
+        scale = np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+def artifact_path(model_path):
+    """Artifact directory that sits next to a .pkl model package"""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+def write_arrays(path, arrays, meta):
+    """Write .npy arrays plus meta.json into a directory, replacing any old one
+
+    The directory is assembled under a temporary name. An old directory is
+    renamed aside first, the new one renamed into place, and only then is the
+    old one removed, so readers see the old artifact, the new one, or for an
+    instant none at all (load_artifact() then returns None and callers fall
+    back to the .pkl), never a half-written or half-deleted one. A directory
+    cannot be swapped in a single rename, so the replacement is not atomic.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp_dir = tempfile.mkdtemp(dir=parent, suffix='.tmp')
+    old_dir = None
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        if os.path.isdir(path):
+            old_dir = tmp_dir + '.old'
+            os.replace(path, old_dir)
+        try:
+            os.replace(tmp_dir, path)
+        except OSError:
+            if old_dir is not None:
+                os.replace(old_dir, path)
+                old_dir = None
+            raise
+    finally:
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if old_dir is not None:
+            # Memory-mapped files of the old artifact stay readable until unmapped
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+def save_artifact(path, model_package, model_hash=None):
+    """Write the engine, scaler, labels, lookup table and drift reference profile as uncompressed arrays"""
+    engine = model_package['engine']
+    mean, scale = scaler_arrays(model_package['scaler'], len(model_package['feature_names']))
+
+    arrays = {name: getattr(engine, name) for name in FOREST_ARRAYS}
+    arrays['scaler_mean'] = mean
+    arrays['scaler_scale'] = scale
+    raw_engine = model_package.get('raw_engine')
+    if raw_engine is not None:
+        arrays['raw_threshold'] = raw_engine.threshold
+    lookup_table = model_package.get('lookup_table')
+    if lookup_table is not None:
+        arrays['lookup_probabilities'] = lookup_table.probabilities
+        arrays['lookup_predicted'] = lookup_table.predicted
+    profile = model_package.get('reference_profile')
+    if profile is not None:
+        for name in PROFILE_ARRAYS:
+            arrays[f'profile_{name}'] = np.asarray(profile[name], dtype=np.float64)
+
+    meta = {
+        'version': ARTIFACT_VERSION,
+        'model_hash': model_hash,
+        'max_depth': int(engine.max_depth),
+        'class_names': [str(c) for c in model_package['label_encoder'].classes_],
+        'feature_names': [str(c) for c in model_package['feature_names']],
+        'model_name': model_package.get('model_name'),
+        'accuracy': model_package.get('accuracy'),
+        'training_date': str(model_package.get('training_date', '')),
+        'reference_profile': {name: profile[name] for name in PROFILE_LABELS} if profile is not None else None,
+    }
+    write_arrays(path, arrays, meta)
+
+def load_artifact(path, model_hash=None):
+    """Memory-map an artifact directory into a model package
+
+    Returns None when the artifact is missing, from another format version,
+    or was exported from a different model file than ``model_hash``.
+    """
+    try:
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != ARTIFACT_VERSION:
+        return None
+    if model_hash is not None and meta.get('model_hash') != model_hash:
+        return None
+
+    def mmap(name):
+        return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+    try:
+        engine = FlatForest(max_depth=meta['max_depth'], **{name: mmap(name) for name in FOREST_ARRAYS})
+        model_package = {
+            'model': None,
+            'engine': engine,
+            'scaler': ArrayScaler(mmap('scaler_mean'), mmap('scaler_scale')),
+            'label_encoder': ArrayLabelEncoder(np.array(meta['class_names'])),
+            'feature_names': meta['feature_names'],
+            'target_names': meta['class_names'],
+            'model_name': meta.get('model_name'),
+            'accuracy': meta.get('accuracy'),
+            'training_date': meta.get('training_date'),
+            'model_hash': meta.get('model_hash'),
+            'raw_engine': None,
+        }
+        if os.path.exists(os.path.join(path, 'raw_threshold.npy')):
+            model_package['raw_engine'] = FlatForest(
+                engine.feature, mmap('raw_threshold'), engine.left, engine.right,
+                engine.value, engine.roots, engine.max_depth, input_dtype=np.float64)
+        if os.path.exists(os.path.join(path, 'lookup_probabilities.npy')):
+            model_package['lookup_probabilities'] = mmap('lookup_probabilities')
+            model_package['lookup_predicted'] = mmap('lookup_predicted')
+        if meta.get('reference_profile') is not None:
+            # Same form as in the .pkl: plain lists
+            model_package['reference_profile'] = dict(
+                meta['reference_profile'], **{name: np.load(os.path.join(path, f'profile_{name}.npy')).tolist()
+                                              for name in PROFILE_ARRAYS})
+    except (OSError, KeyError, ValueError):
+        return None
+    return model_package
+
+def main(argv=None):
+    from predictor import MODEL_PATH, file_hash, load_model_package
+
+    parser = argparse.ArgumentParser(description="Export a model package as a memory-mappable artifact")
+    parser.add_argument('model', nargs='?', default=MODEL_PATH, help="Model package (.pkl) to export")
+    parser.add_argument('--output', help="Artifact directory (default: next to the model)")
+    args = parser.parse_args(argv)
+
+    output = args.output or artifact_path(args.model)
+    model_package = load_model_package(args.model, use_artifact=False)
+    if model_package.get('engine') is None:
+        print("❌ Only RandomForest model packages can be exported")
+        return 1
+    save_artifact(output, model_package, file_hash(args.model))
+    print(f"✅ Artifact written to {os.path.abspath(output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# model_registry.py - Versioned model registry with background hot reload
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime
+import numpy as np
+from predictor import MODEL_PATH, file_hash, load_model_package
+
+REGISTRY_DIR = 'model_registry'
+MANIFEST_NAME = 'manifest.json'
+POLL_INTERVAL = 5.0
+
+def read_manifest(registry_dir=REGISTRY_DIR):
+    """Return the registry manifest, or an empty one if the registry does not exist"""
+    try:
+        with open(os.path.join(registry_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'current': None, 'versions': []}
+
+def write_manifest(manifest, registry_dir=REGISTRY_DIR):
+    """Replace the manifest atomically so watchers never read a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=registry_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(registry_dir, MANIFEST_NAME))
+
+def version_entry(manifest, version):
+    """Find a version in the manifest"""
+    for entry in manifest['versions']:
+        if entry['version'] == version:
+            return entry
+    return None
+
+def current_model_path(registry_dir=REGISTRY_DIR, fallback_path=MODEL_PATH):
+    """Path of the registry's active version, or the plain .pkl without a registry"""
+    manifest = read_manifest(registry_dir)
+    entry = version_entry(manifest, manifest['current']) if manifest['current'] else None
+    if entry:
+        return os.path.join(registry_dir, entry['file'])
+    return fallback_path
+
+def validate_model_package(model_package):
+    """Raise ValueError unless the package scores every questionnaire sensibly"""
+    for key in ('scaler', 'label_encoder', 'feature_names'):
+        if key not in model_package:
+            raise ValueError(f"Model package is missing '{key}'")
+    lookup_table = model_package.get('lookup_table')
+    if lookup_table is None:
+        raise ValueError("Model package could not be scored over the input space")
+    probabilities = np.asarray(lookup_table.probabilities)
+    if not np.isfinite(probabilities).all():
+        raise ValueError("Model produced non-finite probabilities")
+    if not np.allclose(probabilities.sum(axis=-1), 1.0):
+        raise ValueError("Model probabilities do not sum to 1")
+
+def load_version(registry_dir, entry):
+    """Load and validate one registry version, tagging it with its version name"""
+    model_path = os.path.join(registry_dir, entry['file'])
+    if file_hash(model_path) != entry['sha256']:
+        raise ValueError(f"Checksum mismatch for version {entry['version']}")
+    model_package = load_model_package(model_path)
+    validate_model_package(model_package)
+    model_package['model_version'] = entry['version']
+    return model_package
+
+def publish(model_path, registry_dir=REGISTRY_DIR, version=None, activate=True):
+    """Copy a model package into the registry as a new version"""
+    version = version or datetime.now().strftime('v%Y%m%d%H%M%S')
+    os.makedirs(registry_dir, exist_ok=True)
+    manifest = read_manifest(registry_dir)
+    if version_entry(manifest, version):
+        raise ValueError(f"Version {version} already exists")
+
+    # Validate before the version becomes visible to watchers
+    version_dir = os.path.join(registry_dir, version)
+    os.makedirs(version_dir)
+    target = os.path.join(version_dir, os.path.basename(model_path))
+    shutil.copy2(model_path, target)
+    try:
+        model_package = load_model_package(target)
+        validate_model_package(model_package)
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    manifest['versions'].append({
+        'version': version,
+        'file': os.path.relpath(target, registry_dir),
+        'sha256': file_hash(target),
+        'created': datetime.now().isoformat(),
+        'model_name': model_package.get('model_name'),
+        'accuracy': model_package.get('accuracy'),
+    })
+    if activate:
+        manifest['current'] = version
+    write_manifest(manifest, registry_dir)
+    return version
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    """Point the registry at an existing version (deploy or roll back)"""
+    manifest = read_manifest(registry_dir)
+    if not version_entry(manifest, version):
+        raise ValueError(f"Unknown version {version}")
+    manifest['current'] = version
+    write_manifest(manifest, registry_dir)
+
+class ModelRegistry:
+    """Serves the current model version and hot-swaps it when the manifest changes
+
+    current() hands out the active package; a swap only rebinds the
+    reference, so requests already holding the old package finish on it.
+    Without a registry directory the plain .pkl is served as a fixed version.
+    """
+
+    def __init__(self, registry_dir=REGISTRY_DIR, fallback_path=MODEL_PATH, poll_interval=POLL_INTERVAL):
+        self.registry_dir = registry_dir
+        self.fallback_path = fallback_path
+        self.poll_interval = poll_interval
+        self._active = None
+        self._manifest_mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self.reload()
+        if self._active is None:
+            raise FileNotFoundError(f"No model in {registry_dir} and no {fallback_path}")
+
+    def current(self):
+        """Return the active model package"""
+        return self._active
+
+    @property
+    def version(self):
+        return self._active.get('model_version') if self._active else None
+
+    def reload(self):
+        """Load the manifest's current version if it differs from the active one"""
+        manifest_path = os.path.join(self.registry_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._active is not None and mtime == self._manifest_mtime:
+            return False
+        self._manifest_mtime = mtime
+
+        manifest = read_manifest(self.registry_dir)
+        entry = version_entry(manifest, manifest['current']) if manifest['current'] else None
+        if entry is None:
+            if self._active is not None or not os.path.exists(self.fallback_path):
+                return False
+            model_package = load_model_package(self.fallback_path)
+            model_package['model_version'] = 'sha256:' + file_hash(self.fallback_path)[:12]
+        elif self._active is not None and entry['version'] == self.version:
+            return False
+        else:
+            try:
+                model_package = load_version(self.registry_dir, entry)
+            except Exception as e:
+                # Keep serving the old model; a bad upload must not take the service down
+                self.last_error = f"Version {entry['version']} rejected: {e}"
+                print(f"❌ {self.last_error}")
+                if self._active is not None:
+                    return False
+                raise
+
+        self._active = model_package
+        self.last_error = None
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                if self.reload():
+                    print(f"✅ Model version {self.version} is now active")
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Model reload failed: {e}")
+
+    def start_watcher(self):
+        """Poll the manifest in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='model-registry-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop_watcher(self):
+        self._stop.set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry")
+    parser.add_argument('--registry', default=REGISTRY_DIR, help="Registry directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish_cmd = commands.add_parser('publish', help="Add a model package as a new version")
+    publish_cmd.add_argument('model', nargs='?', default=MODEL_PATH)
+    publish_cmd.add_argument('--version', help="Version name (default: timestamp)")
+    publish_cmd.add_argument('--no-activate', action='store_true', help="Register without making it current")
+
+    activate_cmd = commands.add_parser('activate', help="Make an existing version current")
+    activate_cmd.add_argument('version')
+
+    commands.add_parser('list', help="Show registered versions")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'publish':
+            version = publish(args.model, args.registry, args.version, not args.no_activate)
+            print(f"✅ Published {args.model} as {version}")
+        elif args.command == 'activate':
+            activate(args.version, args.registry)
+            print(f"✅ {args.version} is now current")
+        else:
+            manifest = read_manifest(args.registry)
+            for entry in manifest['versions']:
+                marker = '*' if entry['version'] == manifest['current'] else ' '
+                print(f"{marker} {entry['version']}  {entry['created']}  {entry.get('model_name')}  "
+                      f"accuracy={entry.get('accuracy')}")
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
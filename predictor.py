@@ -0,0 +1,506 @@
+# predictor.py - Model loading and precomputed prediction lookup
+
+import hashlib
+import os
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from forest_engine import flatten_model
+from model_artifact import artifact_path, load_artifact, save_artifact, scaler_arrays
+
+MODEL_PATH = 'depression_prediction_model.pkl'
+LOOKUP_SUFFIX = '.lookup.npz'
+BATCH_CHUNK_SIZE = 10000
+# Above this many rows sklearn's compiled tree walk is faster than the NumPy engine
+ENGINE_MAX_ROWS = 1024
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def split_feature_names(feature_names):
+    """Split the model's feature names into symptom columns and Age_* columns"""
+    symptom_columns = [c for c in feature_names if not c.startswith('Age_')]
+    age_columns = [c for c in feature_names if c.startswith('Age_')]
+    return symptom_columns, age_columns
+
+def is_positive(value):
+    """Interpret a questionnaire answer ('Y', 'Yes', 1, True) as 0/1"""
+    if isinstance(value, str):
+        return 1 if value.strip().upper() in ('Y', 'YES') else 0
+    return value
+
+def encode_symptoms(symptoms_dict, feature_names):
+    """Encode a symptoms dict as (symptom bitmask, age code)
+
+    Bit i of the mask is set when symptom column i is present. The age code
+    is the index of the matching Age_* column, or len(age_columns) when the
+    age group has no column of its own (e.g. 'elderly'). Returns None if an
+    answer is not a plain 0/1 and so cannot be looked up.
+    """
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    mask = 0
+    for bit, column in enumerate(symptom_columns):
+        value = is_positive(symptoms_dict.get(column, 0))
+        if value == 1:
+            mask |= 1 << bit
+        elif value != 0:
+            return None
+
+    age_code = len(age_columns)
+    age_col = f'Age_{symptoms_dict.get("Age")}'
+    if age_col in age_columns:
+        age_code = age_columns.index(age_col)
+    return mask, age_code
+
+def enumerate_inputs(feature_names):
+    """Build the feature matrix for every (age code, symptom mask) combination
+
+    Row ``age_code * 2**n_symptoms + mask`` holds the encoded input, so the
+    result lines up with the lookup table layout.
+    """
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    n_masks = 1 << len(symptom_columns)
+    n_ages = len(age_columns) + 1
+
+    masks = np.arange(n_masks)
+    symptom_bits = (masks[:, None] >> np.arange(len(symptom_columns))) & 1
+    age_onehot = np.eye(n_ages, len(age_columns), dtype=np.int64)
+
+    X = pd.DataFrame(0, index=range(n_ages * n_masks), columns=feature_names)
+    X[symptom_columns] = np.tile(symptom_bits, (n_ages, 1))
+    if age_columns:
+        X[age_columns] = np.repeat(age_onehot, n_masks, axis=0)
+    return X
+
+class PredictionTable:
+    """Every possible questionnaire scored once, indexed by age code and symptom mask"""
+
+    def __init__(self, probabilities, class_names, feature_names, model_hash=None, predicted=None):
+        self.probabilities = probabilities
+        if predicted is None:
+            predicted = probabilities.argmax(axis=-1).astype(np.uint8)
+        self.predicted = predicted
+        self.class_names = [str(c) for c in class_names]
+        self.feature_names = list(feature_names)
+        self.model_hash = model_hash
+
+    @classmethod
+    def build(cls, model_package, model_hash=None):
+        """Score the whole input space through the scaler and model"""
+        feature_names = list(model_package['feature_names'])
+        symptom_columns, age_columns = split_feature_names(feature_names)
+        X = model_package['scaler'].transform(enumerate_inputs(feature_names))
+        engine = model_package.get('engine')
+        if engine is not None:
+            proba = engine.predict_proba(X)
+        else:
+            proba = model_package['model'].predict_proba(X)
+        proba = proba.reshape(len(age_columns) + 1, 1 << len(symptom_columns), -1)
+        return cls(proba, model_package['label_encoder'].classes_, feature_names, model_hash)
+
+    @classmethod
+    def load(cls, path, model_hash):
+        """Load a persisted table, or return None if it is missing or stale"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['model_hash']) != model_hash:
+                    return None
+                return cls(data['probabilities'], data['class_names'],
+                           data['feature_names'], model_hash)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, path):
+        """Write the table atomically next to the model file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f,
+                         probabilities=self.probabilities,
+                         class_names=np.array(self.class_names),
+                         feature_names=np.array(self.feature_names),
+                         model_hash=np.array(self.model_hash or ''))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lookup(self, symptoms_dict):
+        """Return (prediction, probabilities, confidence), or None if not encodable"""
+        key = encode_symptoms(symptoms_dict, self.feature_names)
+        if key is None:
+            return None
+        mask, age_code = key
+        proba = self.probabilities[age_code, mask]
+        predicted = self.predicted[age_code, mask]
+        probabilities = {name: float(p) for name, p in zip(self.class_names, proba)}
+        return self.class_names[predicted], probabilities, float(proba[predicted])
+
+def load_prediction_table(model_package, model_path=MODEL_PATH):
+    """Load the cached lookup table for a model, building and saving it if needed"""
+    model_hash = file_hash(model_path)
+    table_path = model_path + LOOKUP_SUFFIX
+    table = PredictionTable.load(table_path, model_hash)
+    if table is None:
+        table = PredictionTable.build(model_package, model_hash)
+        try:
+            table.save(table_path)
+        except OSError:
+            pass  # Read-only deployments just rebuild the table on start
+    return table
+
+def fold_scaler(model_package):
+    """Fold the StandardScaler into the forest's split thresholds
+
+    Returns a FlatForest that takes raw 0/1 features, or None when the folded
+    forest does not reproduce scaler + forest exactly on every questionnaire.
+    """
+    engine = model_package.get('engine')
+    if engine is None:
+        return None
+    feature_names = list(model_package['feature_names'])
+    mean, scale = scaler_arrays(model_package['scaler'], len(feature_names))
+    if not (scale > 0).all():
+        return None
+    raw_engine = engine.fold_scaler(mean, scale)
+    if raw_engine is None:
+        return None
+
+    X = enumerate_inputs(feature_names)
+    lookup_table = model_package.get('lookup_table')
+    if lookup_table is not None:
+        expected = lookup_table.probabilities.reshape(len(X), -1)
+    else:
+        expected = engine.predict_proba(model_package['scaler'].transform(X))
+    if not np.array_equal(raw_engine.predict_proba(X.to_numpy(dtype=np.float64)), expected):
+        return None
+    return raw_engine
+
+def load_model_package(model_path=MODEL_PATH, use_artifact=True):
+    """Load the trained model package with its NumPy engine and lookup table
+
+    A memory-mapped artifact exported from the same .pkl (see
+    model_artifact.py) is preferred, so workers start without unpickling and
+    share the array pages. Otherwise the .pkl is loaded and the artifact is
+    written for the next worker.
+    """
+    model_hash = file_hash(model_path) if os.path.exists(model_path) else None
+    mmap_path = artifact_path(model_path)
+
+    if use_artifact:
+        model_package = load_artifact(mmap_path, model_hash)
+        if model_package is not None:
+            if 'lookup_probabilities' in model_package:
+                model_package['lookup_table'] = PredictionTable(
+                    model_package.pop('lookup_probabilities'),
+                    model_package['label_encoder'].classes_,
+                    model_package['feature_names'],
+                    model_package['model_hash'],
+                    predicted=model_package.pop('lookup_predicted'))
+            else:
+                model_package['lookup_table'] = PredictionTable.build(model_package, model_hash)
+            return model_package
+
+    model_package = joblib.load(model_path)
+    model_package['engine'] = flatten_model(model_package['model'])
+    model_package['lookup_table'] = load_prediction_table(model_package, model_path)
+    model_package['raw_engine'] = fold_scaler(model_package)
+
+    if use_artifact and model_package['engine'] is not None:
+        try:
+            save_artifact(mmap_path, model_package, model_hash)
+        except OSError:
+            pass  # Read-only deployments keep loading the .pkl
+    return model_package
+
+def predict_depression(symptoms_dict, model_package):
+    """Predict depression type based on symptoms"""
+    if not model_package:
+        return "Model not loaded", {}, 0.0
+    
+    # Every 0/1 questionnaire is precomputed; look it up directly
+    lookup_table = model_package.get('lookup_table')
+    if lookup_table is not None:
+        result = lookup_table.lookup(symptoms_dict)
+        if result is not None:
+            return result
+    
+    model = model_package['model']
+    scaler = model_package['scaler']
+    label_encoder = model_package['label_encoder']
+    
+    # Create a dataframe with all possible columns
+    all_columns = model_package['feature_names']
+    input_data = pd.DataFrame(0, index=[0], columns=all_columns)
+    
+    # Fill in the provided symptoms
+    for symptom, value in symptoms_dict.items():
+        if symptom in input_data.columns:
+            input_data[symptom] = is_positive(value)
+        elif symptom == 'Age':
+            age_col = f'Age_{symptoms_dict["Age"]}'
+            if age_col in input_data.columns:
+                input_data[age_col] = 1
+    
+    # Make prediction (one pass through the flattened forest when available)
+    raw_engine = model_package.get('raw_engine')
+    engine = model_package.get('engine')
+    if raw_engine is not None:
+        # Scaler is folded into the split thresholds; feed raw 0/1 features
+        predicted, _, proba = raw_engine.predict(input_data.to_numpy(dtype=np.float64))
+        prediction_encoded = predicted[0]
+        prediction_prob = proba[0]
+    elif engine is not None:
+        input_scaled = scaler.transform(input_data)
+        predicted, _, proba = engine.predict(input_scaled)
+        prediction_encoded = predicted[0]
+        prediction_prob = proba[0]
+    else:
+        input_scaled = scaler.transform(input_data)
+        prediction_encoded = model.predict(input_scaled)[0]
+        prediction_prob = model.predict_proba(input_scaled)[0]
+    
+    # Decode the prediction
+    prediction = label_encoder.inverse_transform([prediction_encoded])[0]
+    confidence = prediction_prob[prediction_encoded]
+    
+    # Get probabilities for all classes
+    probabilities = {}
+    for i, prob in enumerate(prediction_prob):
+        class_name = label_encoder.inverse_transform([i])[0]
+        probabilities[class_name] = float(prob)
+    
+    return prediction, probabilities, confidence
+
+def encode_row(symptoms_dict, feature_names):
+    """One questionnaire as a (1, n_features) raw feature row, like predict_depression()"""
+    row = np.zeros((1, len(feature_names)))
+    for j, column in enumerate(feature_names):
+        if column in symptoms_dict:
+            row[0, j] = is_positive(symptoms_dict[column])
+    age_col = f'Age_{symptoms_dict.get("Age")}'
+    if age_col in feature_names:
+        row[0, feature_names.index(age_col)] = 1
+    return row
+
+def predict_depression_anytime(symptoms_dict, model_package, tolerance=None):
+    """Like predict_depression(), but walk the forest only until the answer is settled
+
+    Returns (prediction, probabilities, confidence, trees_used);
+    probabilities average the trees used. Without ``tolerance`` the
+    prediction always matches the full forest; with it, scoring also stops
+    once the leading probability is known to within +/- tolerance (95%
+    interval over trees), which can change close calls. Questionnaires the
+    lookup table covers are answered from it (the full forest, faster than
+    any walk), as are models that are not a RandomForest; both report
+    trees_used as None.
+    """
+    if not model_package:
+        return "Model not loaded", {}, 0.0, None
+
+    lookup_table = model_package.get('lookup_table')
+    if lookup_table is not None:
+        result = lookup_table.lookup(symptoms_dict)
+        if result is not None:
+            return result + (None,)
+
+    feature_names = list(model_package['feature_names'])
+    row = encode_row(symptoms_dict, feature_names)
+    engine = model_package.get('raw_engine')
+    if engine is None and model_package.get('engine') is not None:
+        engine = model_package['engine']
+        row = model_package['scaler'].transform(pd.DataFrame(row, columns=feature_names))
+    if engine is None:
+        return predict_depression(symptoms_dict, dict(model_package, lookup_table=None)) + (None,)
+
+    predicted, confidence, proba, trees_used = engine.predict_anytime(row[0], tolerance=tolerance)
+    class_names = list(model_package['label_encoder'].classes_)
+    probabilities = {str(name): float(p) for name, p in zip(class_names, proba)}
+    return class_names[predicted], probabilities, confidence, trees_used
+
+def explain_depression(symptoms_dict, model_package, class_name=None):
+    """How much each answer moved the probability of one class (default: the predicted one)
+
+    Returns {'class': ..., 'bias': ..., 'contributions': {feature: value}}, where
+    the Age_* one-hot columns are reported together as 'Age'. The bias is the
+    forest's prior for the class; bias plus all contributions is the predicted
+    probability. Returns None for models that are not a RandomForest.
+    """
+    feature_names = list(model_package['feature_names'])
+    row = encode_row(symptoms_dict, feature_names)
+    if model_package.get('raw_engine') is not None:
+        bias, contributions = model_package['raw_engine'].contributions(row)
+    elif model_package.get('engine') is not None:
+        X_scaled = model_package['scaler'].transform(pd.DataFrame(row, columns=feature_names))
+        bias, contributions = model_package['engine'].contributions(X_scaled)
+    else:
+        return None
+
+    class_names = [str(c) for c in model_package['label_encoder'].classes_]
+    if class_name is None:
+        class_index = int((bias[0] + contributions[0].sum(axis=0)).argmax())
+    else:
+        class_index = class_names.index(class_name)
+
+    by_feature = {}
+    for j, column in enumerate(feature_names):
+        key = 'Age' if column.startswith('Age_') else column
+        by_feature[key] = by_feature.get(key, 0.0) + float(contributions[0, j, class_index])
+    return {
+        'class': class_names[class_index],
+        'bias': float(bias[0, class_index]),
+        'contributions': by_feature,
+    }
+
+def what_if_depression(symptoms_dict, model_package, age_groups=()):
+    """Re-score a questionnaire with each symptom flipped and each other age group
+
+    All variants are scored in one batch (a single lookup-table gather for
+    0/1 answers). Returns a list of dicts with the changed 'feature', its new
+    'value', the resulting 'prediction' and 'confidence', and 'shift', the
+    change in probability of the original prediction.
+    """
+    feature_names = list(model_package['feature_names'])
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    age_codes_by_group = {column[len('Age_'):]: i for i, column in enumerate(age_columns)}
+    base = encode_row(symptoms_dict, feature_names)[0]
+    base_age = symptoms_dict.get('Age')
+    other_ages = [age for age in age_groups if age != base_age]
+
+    variants = [(None, None)]
+    variants += [(column, 0 if base[feature_names.index(column)] >= 0.5 else 1) for column in symptom_columns]
+    variants += [('Age', age) for age in other_ages]
+
+    rows = np.repeat(base[np.newaxis, :], len(variants), axis=0)
+    age_codes = np.full(len(variants), age_codes_by_group.get(base_age, len(age_columns)), dtype=np.intp)
+    for i, (column, value) in enumerate(variants):
+        if column == 'Age':
+            rows[i, [feature_names.index(c) for c in age_columns]] = 0
+            age_codes[i] = age_codes_by_group.get(value, len(age_columns))
+            if age_codes[i] < len(age_columns):
+                rows[i, feature_names.index(age_columns[age_codes[i]])] = 1
+        elif column is not None:
+            rows[i, feature_names.index(column)] = value
+
+    predicted, proba = score_matrix(rows, age_codes, model_package)
+    class_names = [str(c) for c in model_package['label_encoder'].classes_]
+    base_class = predicted[0]
+    return [{
+        'feature': column,
+        'value': value,
+        'prediction': class_names[predicted[i]],
+        'confidence': float(proba[i, predicted[i]]),
+        'shift': float(proba[i, base_class] - proba[0, base_class]),
+    } for i, (column, value) in enumerate(variants) if column is not None]
+
+def answer_value(value):
+    """Numeric value of one answer: 'Y'/'Yes' -> 1, numbers as-is, anything else 0"""
+    if isinstance(value, str):
+        if value.strip().upper() in ('Y', 'YES'):
+            return 1.0
+        value = pd.to_numeric(value, errors='coerce')
+    return 0.0 if pd.isna(value) else float(value)
+
+def encode_answers(values):
+    """Vectorized answer_value() for a column of questionnaire answers
+
+    Answer columns hold a handful of distinct values, so each distinct value
+    is converted once and the codes are mapped through that small table.
+    """
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).to_numpy(dtype=np.float64)
+    codes, uniques = pd.factorize(values)
+    table = np.array([answer_value(u) for u in uniques] + [0.0])
+    return table[codes]
+
+def encode_frame(df, feature_names):
+    """Encode questionnaire rows as (feature matrix, age codes)
+
+    Symptom columns hold Y/N (or 0/1) answers and the 'Age' column the age
+    group, as in the training CSV. Missing columns are treated as 'N'.
+    """
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    X = np.zeros((len(df), len(feature_names)))
+    for j, column in enumerate(feature_names):
+        if column in symptom_columns and column in df.columns:
+            X[:, j] = encode_answers(df[column])
+
+    age_codes = np.full(len(df), len(age_columns), dtype=np.intp)
+    if 'Age' in df.columns:
+        codes = {column[len('Age_'):]: i for i, column in enumerate(age_columns)}
+        age_codes = df['Age'].astype(str).map(codes).fillna(len(age_columns)).to_numpy(dtype=np.intp)
+        for i, column in enumerate(age_columns):
+            X[:, feature_names.index(column)] = age_codes == i
+    return X, age_codes
+
+def score_matrix(X, age_codes, model_package):
+    """Return (predicted class indices, probabilities) for an encoded chunk"""
+    feature_names = list(model_package['feature_names'])
+    symptom_columns, _ = split_feature_names(feature_names)
+    symptoms = X[:, [feature_names.index(c) for c in symptom_columns]]
+
+    lookup_table = model_package.get('lookup_table')
+    if lookup_table is not None and np.isin(symptoms, (0.0, 1.0)).all():
+        masks = symptoms.astype(np.intp) @ (1 << np.arange(len(symptom_columns)))
+        return lookup_table.predicted[age_codes, masks], lookup_table.probabilities[age_codes, masks]
+
+    # The engine wins on small chunks; large ones go to sklearn when the model is loaded
+    use_engine = len(X) <= ENGINE_MAX_ROWS or model_package.get('model') is None
+    raw_engine = model_package.get('raw_engine')
+    if raw_engine is not None and use_engine:
+        predicted, _, proba = raw_engine.predict(X)
+        return predicted, proba
+
+    X_scaled = model_package['scaler'].transform(pd.DataFrame(X, columns=feature_names))
+    engine = model_package.get('engine')
+    if engine is not None and use_engine:
+        predicted, _, proba = engine.predict(X_scaled)
+        return predicted, proba
+    proba = model_package['model'].predict_proba(X_scaled)
+    return proba.argmax(axis=1), proba
+
+def iter_chunks(records, chunk_size):
+    """Yield DataFrame chunks from a DataFrame, DataFrame chunks, or dict records"""
+    if isinstance(records, pd.DataFrame):
+        for start in range(0, len(records), chunk_size):
+            yield records.iloc[start:start + chunk_size]
+        return
+
+    batch = []
+    for record in records:
+        if isinstance(record, pd.DataFrame):
+            yield from iter_chunks(record, chunk_size)
+            continue
+        batch.append(record)
+        if len(batch) == chunk_size:
+            yield pd.DataFrame.from_records(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch)
+
+def predict_depression_batch(records, model_package, chunk_size=BATCH_CHUNK_SIZE):
+    """Score many questionnaires, yielding one result DataFrame per chunk
+
+    Each result keeps the input columns and adds 'predicted_type',
+    'confidence' and one 'probability_<type>' column per class.
+    """
+    feature_names = list(model_package['feature_names'])
+    class_names = np.asarray(model_package['label_encoder'].classes_).astype(str)
+    for chunk in iter_chunks(records, chunk_size):
+        X, age_codes = encode_frame(chunk, feature_names)
+        predicted, proba = score_matrix(X, age_codes, model_package)
+
+        result = chunk.reset_index(drop=True).copy()
+        result['predicted_type'] = class_names[predicted]
+        result['confidence'] = proba[np.arange(len(predicted)), predicted]
+        for i, name in enumerate(class_names):
+            result[f'probability_{name}'] = proba[:, i]
+        yield result
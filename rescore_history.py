@@ -0,0 +1,136 @@
+# rescore_history.py - Re-score stored assessments with a new model and report what would change
+
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from database import DB_PATH, create_connection, iter_assessments
+from model_registry import REGISTRY_DIR, current_model_path
+from predictor import load_model_package, encode_frame, score_matrix
+
+DB_CHUNK_ROWS = 10000
+SHIFT_BINS = 20
+
+class RescoreReport:
+    """Running totals over re-scored chunks; memory does not grow with the table"""
+
+    def __init__(self, bins=SHIFT_BINS):
+        self.rows = 0
+        self.changed = 0
+        self.pairs = {}
+        self.bin_edges = np.linspace(-1.0, 1.0, bins + 1)
+        self.shift_counts = np.zeros(bins, dtype=np.int64)
+        self.shift_sum = 0.0
+        self.shift_rows = 0
+
+    def add(self, old_type, new_type, old_confidence, new_confidence):
+        self.rows += len(old_type)
+        changed = old_type != new_type
+        self.changed += int(changed.sum())
+        pair_counts = pd.Series(1, index=pd.MultiIndex.from_arrays([old_type[changed], new_type[changed]]))
+        for pair, count in pair_counts.groupby(level=[0, 1]).sum().items():
+            self.pairs[pair] = self.pairs.get(pair, 0) + int(count)
+
+        # Rows saved without a confidence have no shift to report
+        shift = new_confidence - old_confidence
+        shift = shift[np.isfinite(shift)]
+        self.shift_counts += np.histogram(np.clip(shift, -1.0, 1.0), bins=self.bin_edges)[0]
+        self.shift_sum += float(shift.sum())
+        self.shift_rows += len(shift)
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'changed': self.changed,
+            'changed_fraction': self.changed / self.rows if self.rows else 0.0,
+            'changed_by_type': [{'old_type': old, 'new_type': new, 'count': count}
+                                for (old, new), count in sorted(self.pairs.items(), key=lambda item: -item[1])],
+            'confidence_shift': {
+                'bin_edges': self.bin_edges.tolist(),
+                'counts': self.shift_counts.tolist(),
+                'mean': self.shift_sum / self.shift_rows if self.shift_rows else 0.0,
+            },
+        }
+
+def rescore(conn, model_package, chunk_size=DB_CHUNK_ROWS, bins=SHIFT_BINS, changed_file=None):
+    """Score every stored assessment with ``model_package`` and compare with the stored prediction
+
+    Returns a RescoreReport. With ``changed_file`` (an open text file) the
+    rows whose type changes are written to it as CSV.
+    """
+    feature_names = list(model_package['feature_names'])
+    class_names = np.asarray(model_package['label_encoder'].classes_).astype(str)
+    report = RescoreReport(bins)
+    for chunk in iter_assessments(conn, chunk_size):
+        X, age_codes = encode_frame(chunk, feature_names)
+        predicted, proba = score_matrix(X, age_codes, model_package)
+        new_type = class_names[predicted]
+        new_confidence = proba[np.arange(len(predicted)), predicted]
+        old_type = chunk['predicted_type'].astype(str).to_numpy()
+        old_confidence = pd.to_numeric(chunk['confidence'], errors='coerce').to_numpy(dtype=np.float64)
+        report.add(old_type, new_type, old_confidence, new_confidence)
+
+        if changed_file is not None:
+            changed = old_type != new_type
+            pd.DataFrame({
+                'prediction_id': chunk['prediction_id'].to_numpy()[changed],
+                'old_type': old_type[changed],
+                'new_type': new_type[changed],
+                'old_confidence': old_confidence[changed],
+                'new_confidence': new_confidence[changed],
+            }).to_csv(changed_file, index=False, header=(changed_file.tell() == 0))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report how stored assessments would be scored by a new model")
+    parser.add_argument('model', nargs='?', help="Model package to score with (default: the registry's current version)")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database with the stored assessments")
+    parser.add_argument('--registry', default=REGISTRY_DIR, help="Registry to take the current model from")
+    parser.add_argument('--chunk-size', type=int, default=DB_CHUNK_ROWS, help="Database rows scored at a time")
+    parser.add_argument('--bins', type=int, default=SHIFT_BINS, help="Confidence shift histogram bins over [-1, 1]")
+    parser.add_argument('--report', help="Write the diff report as JSON here")
+    parser.add_argument('--changed', help="Write the assessments whose type changes to this CSV")
+    args = parser.parse_args(argv)
+
+    model_path = args.model or current_model_path(args.registry)
+    try:
+        model_package = load_model_package(model_path)
+    except FileNotFoundError:
+        print(f"❌ Model file not found: {model_path}")
+        return 1
+
+    try:
+        conn = create_connection(args.db)
+        changed_file = open(args.changed, 'w', newline='', encoding='utf-8') if args.changed else None
+        try:
+            report = rescore(conn, model_package, args.chunk_size, args.bins, changed_file)
+        finally:
+            conn.close()
+            if changed_file is not None:
+                changed_file.close()
+    except Exception as e:
+        print(f"❌ Error re-scoring {args.db}: {e}")
+        return 1
+
+    summary = report.to_dict()
+    summary['model'] = model_path
+    print(f"Re-scored {summary['rows']} assessments with {model_path}")
+    print(f"Changed type: {summary['changed']} ({summary['changed_fraction']:.2%})")
+    for pair in summary['changed_by_type']:
+        print(f"  {pair['old_type']} -> {pair['new_type']}: {pair['count']}")
+    print(f"Mean confidence shift: {summary['confidence_shift']['mean']:+.4f}")
+    edges, counts = summary['confidence_shift']['bin_edges'], summary['confidence_shift']['counts']
+    for low, high, count in zip(edges, edges[1:], counts):
+        if count:
+            print(f"  [{low:+.2f}, {high:+.2f}): {count}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"✅ Report written to {os.path.abspath(args.report)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# retrain_model.py - Incremental retraining from confirmed assessments in the database
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from database import DB_PATH, SYMPTOM_COLUMNS, create_connection, iter_labelled_rows
+from drift_monitor import package_reference_profile
+from model_registry import REGISTRY_DIR, current_model_path, publish
+from predictor import MODEL_PATH, split_feature_names
+from train_model import (RANDOM_STATE, TEST_SIZE, READ_CHUNK_ROWS, section, count_rows,
+                         weighted_smote, split_weights, fit_weighted, grow_forest)
+
+ADD_TREES = 50
+DB_CHUNK_ROWS = 10000
+
+# Column order shared by the base CSV and the database rows, so their counts line up
+RAW_COLUMNS = list(SYMPTOM_COLUMNS) + ['Age', 'type']
+
+def stream_counts(base_path, db_path, chunk_rows=READ_CHUNK_ROWS, db_chunk_rows=DB_CHUNK_ROWS):
+    """Distinct (symptoms, Age, type) rows with counts from the base CSV plus confirmed DB rows
+
+    Both sources are read in chunks; only the distinct rows are held in memory.
+    Returns (counts, base_rows, db_rows).
+    """
+    counts = None
+    base_rows = 0
+    if base_path:
+        for chunk in pd.read_csv(base_path, chunksize=chunk_rows):
+            base_rows += len(chunk)
+            counts = count_rows([chunk[RAW_COLUMNS]], counts)
+
+    db_rows = 0
+    conn = create_connection(db_path)
+    try:
+        for chunk in iter_labelled_rows(conn, db_chunk_rows):
+            db_rows += len(chunk)
+            counts = count_rows([chunk[RAW_COLUMNS]], counts)
+    finally:
+        conn.close()
+    return counts, base_rows, db_rows
+
+def encode_counts(counts, model_package):
+    """Feature matrix in the package's column order, encoded labels and weights
+
+    Rows labelled with a type the model does not know are dropped.
+    """
+    df = counts.index.to_frame(index=False)
+    w = counts.to_numpy(dtype=np.int64)
+    known = df['type'].isin(list(model_package['label_encoder'].classes_)).to_numpy()
+    if not known.all():
+        unknown = sorted(set(df.loc[~known, 'type'].astype(str)))
+        print(f"⚠️ Skipping {w[~known].sum()} rows with unknown types: {unknown}")
+        df, w = df[known].reset_index(drop=True), w[known]
+
+    feature_names = list(model_package['feature_names'])
+    symptom_columns, age_columns = split_feature_names(feature_names)
+    X = pd.DataFrame(0, index=df.index, columns=feature_names)
+    for column in symptom_columns:
+        X[column] = (df[column] == 'Y').astype(int)
+    for column in age_columns:
+        X[column] = (df['Age'] == column[len('Age_'):]).astype(int)
+    y = model_package['label_encoder'].transform(df['type'])
+    return X.to_numpy(dtype=np.float64), np.asarray(y, dtype=np.int64), w
+
+def retrain(model_package, counts, add_trees=ADD_TREES, random_state=RANDOM_STATE, test_size=TEST_SIZE):
+    """Grow (or refit) the package's model on the merged rows
+
+    The package's scaler and label encoder are kept, so new trees see the
+    same inputs as the existing ones. Accuracy is measured on a held-out
+    split of the merged data for both models. Returns (model, old_accuracy,
+    new_accuracy, reference_profile), the profile describing the merged
+    rows before SMOTE.
+    """
+    X, y, w = encode_counts(counts, model_package)
+    reference_X, reference_w = X, w
+    X, y, w = weighted_smote(X, y, w, random_state)
+    test_w = split_weights(y, w, test_size, np.random.default_rng(random_state))
+    train_w = w - test_w
+    train, test = np.flatnonzero(train_w), np.flatnonzero(test_w)
+
+    scaler = model_package['scaler']
+    feature_names = list(model_package['feature_names'])
+    X_train = scaler.transform(pd.DataFrame(X[train], columns=feature_names))
+    X_test = scaler.transform(pd.DataFrame(X[test], columns=feature_names))
+
+    model = model_package['model']
+    old_accuracy = accuracy_score(y[test], model.predict(X_test), sample_weight=test_w[test])
+    if add_trees:
+        params = model.get_params()
+        if not (params.get('bootstrap') and 'warm_start' in params):
+            raise ValueError(f"Warm-start growth needs a RandomForest, not {type(model).__name__}; "
+                             "use --add-trees 0 to refit")
+        if len(np.unique(y[train])) != len(model.classes_):
+            raise ValueError("Every depression type must appear in the training rows to grow the forest")
+        print(f"Growing the forest from {len(model.estimators_)} to {len(model.estimators_) + add_trees} trees...")
+        model = grow_forest(model, X_train, y[train], train_w[train], add_trees, random_state)
+    else:
+        print(f"Refitting {type(model).__name__} from scratch...")
+        model = fit_weighted(clone(model), X_train, y[train], train_w[train], random_state)
+    new_accuracy = accuracy_score(y[test], model.predict(X_test), sample_weight=test_w[test])
+    reference_profile = package_reference_profile(dict(model_package, model=model), reference_X, reference_w)
+    return model, old_accuracy, new_accuracy, reference_profile
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the model on confirmed assessments from the database")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database with confirmed predictions")
+    parser.add_argument('--base-data', help="Original training CSV to merge with the database rows")
+    parser.add_argument('--model', help="Model package to start from (default: the registry's current version)")
+    parser.add_argument('--registry', default=REGISTRY_DIR, help="Registry to publish the new version to")
+    parser.add_argument('--add-trees', type=int, default=ADD_TREES,
+                        help="Trees to add to the RandomForest with warm start (0 refits from scratch)")
+    parser.add_argument('--chunk-size', type=int, default=DB_CHUNK_ROWS, help="Database rows fetched at a time")
+    parser.add_argument('--version', help="Registry version name (default: timestamp)")
+    parser.add_argument('--activate', action='store_true', help="Make the new version current")
+    parser.add_argument('--output', help="Also write the retrained model package here")
+    parser.add_argument('--no-publish', action='store_true', help="Do not add the model to the registry")
+    args = parser.parse_args(argv)
+
+    if args.no_publish and not args.output:
+        parser.error("--no-publish needs --output")
+
+    model_path = args.model or current_model_path(args.registry)
+    try:
+        model_package = joblib.load(model_path)
+    except FileNotFoundError:
+        print(f"❌ Model file not found: {model_path}")
+        return 1
+    print(f"Starting from {model_path} ({model_package.get('model_name')})")
+
+    section("LOADING LABELLED DATA")
+    counts, base_rows, db_rows = stream_counts(args.base_data, args.db, db_chunk_rows=args.chunk_size)
+    print(f"Base dataset rows: {base_rows}, confirmed database rows: {db_rows}")
+    if counts is None or not db_rows:
+        print("❌ No confirmed assessments to learn from")
+        return 1
+    print(f"{len(counts)} distinct rows")
+
+    section("RETRAINING")
+    try:
+        model, old_accuracy, new_accuracy, reference_profile = retrain(model_package, counts, args.add_trees)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"Held-out accuracy - previous model: {old_accuracy:.4f}, retrained: {new_accuracy:.4f}")
+
+    package = {key: model_package[key] for key in ('scaler', 'label_encoder', 'feature_names', 'target_names')
+               if key in model_package}
+    package.update({
+        'model': model,
+        'training_date': datetime.now(),
+        'model_name': model_package.get('model_name'),
+        'accuracy': new_accuracy,
+        'training_rows': {'base': base_rows, 'database': db_rows},
+        'reference_profile': reference_profile,
+    })
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        package_path = args.output or os.path.join(work_dir, os.path.basename(MODEL_PATH))
+        joblib.dump(package, package_path)
+        if args.output:
+            print(f"✅ Retrained model package saved to {args.output}")
+        if not args.no_publish:
+            version = publish(package_path, args.registry, args.version, args.activate)
+            state = "current" if args.activate else "not active yet"
+            print(f"✅ Published as version {version} in {args.registry} ({state})")
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+# scoring_service.py - Headless JSON scoring service with a pre-forked worker pool
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sqlite3
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, unquote, urlsplit
+from database import DB_PATH, create_connection, fetch_precautions
+from model_registry import REGISTRY_DIR, ModelRegistry
+from predictor import (MODEL_PATH, predict_depression, predict_depression_anytime,
+                       predict_depression_batch, explain_depression)
+
+DEFAULT_PORT = 8502
+REQUEST_TIMEOUT = 30
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_BATCH_ROWS = 100000
+
+def non_scalar_field(record):
+    """The first key of a symptom object whose value is a list or object, or None"""
+    for key, value in record.items():
+        if value is not None and not isinstance(value, (str, int, float, bool)):
+            return key
+    return None
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """JSON endpoints: /predict, /predict/batch, /precautions/{type}, /health
+
+    /predict?early_exit=1 stops walking the forest once the answer is settled
+    (and, with &tolerance=0.05, once the confidence is known that closely)
+    and reports trees_used; that is null when the lookup table answered.
+    """
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        # Bounds slow clients and idle keep-alive connections
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        """Parse the request body, or send an error response and return None"""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # The body cannot be found, so neither can the next request
+            self.close_connection = True
+            self.send_json(400, {'error': 'Invalid Content-Length'})
+            return None
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_json(413, {'error': f'Request body larger than {MAX_BODY_BYTES} bytes'})
+            return None
+        try:
+            return json.loads(self.rfile.read(length) or b'null')
+        except ValueError as e:
+            self.send_json(400, {'error': f'Invalid JSON: {e}'})
+            return None
+
+    def respond(self, handler):
+        """Run a request handler, turning an unexpected exception into a JSON 500"""
+        try:
+            handler()
+        except OSError:
+            # The client went away mid-response
+            self.close_connection = True
+        except Exception as e:
+            self.log_error("Error handling %s %s: %r", self.command, self.path, e)
+            self.close_connection = True
+            try:
+                self.send_json(500, {'error': f'Internal error: {e}'})
+            except OSError:
+                pass
+
+    def do_GET(self):
+        self.respond(self.handle_get)
+
+    def do_POST(self):
+        self.respond(self.handle_post)
+
+    def handle_get(self):
+        if self.path == '/health':
+            registry = self.server.registry
+            self.send_json(200, {'status': 'ok', 'pid': os.getpid(),
+                                 'model_version': registry.version if registry else None,
+                                 'reload_error': registry.last_error if registry else None})
+        elif self.path.startswith('/precautions/'):
+            depression_type = unquote(self.path[len('/precautions/'):])
+            try:
+                conn = create_connection(self.server.db_path)
+                try:
+                    precautions = fetch_precautions(conn, depression_type)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                self.send_json(500, {'error': f'Database error: {e}'})
+                return
+            if precautions:
+                self.send_json(200, precautions)
+            else:
+                self.send_json(404, {'error': f'No precautions for {depression_type!r}'})
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def handle_post(self):
+        # Read the body first so every reply leaves the connection ready for the next request
+        payload = self.read_json()
+        if payload is None:
+            return
+        url = urlsplit(self.path)
+        if url.path not in ('/predict', '/predict/batch'):
+            self.send_json(404, {'error': 'Not found'})
+            return
+        query = parse_qs(url.query)
+        early_exit = query.get('early_exit', ['0'])[0].lower() in ('1', 'true', 'yes')
+        try:
+            tolerance = float(query['tolerance'][0]) if 'tolerance' in query else None
+        except ValueError:
+            self.send_json(400, {'error': 'tolerance must be a number'})
+            return
+        if self.server.registry is None:
+            self.send_json(503, {'error': 'Model not loaded'})
+            return
+        # Hold one package for the whole request; a hot swap cannot change it mid-way
+        model_package = self.server.registry.current()
+        model_version = model_package.get('model_version')
+
+        if url.path == '/predict':
+            if not isinstance(payload, dict):
+                self.send_json(400, {'error': 'Expected a JSON object of symptoms'})
+                return
+            key = non_scalar_field(payload)
+            if key is not None:
+                self.send_json(400, {'error': f'{key!r} must be a string, number or boolean'})
+                return
+            if early_exit or tolerance is not None:
+                prediction, probabilities, confidence, trees_used = predict_depression_anytime(
+                    payload, model_package, tolerance)
+                self.send_json(200, {'prediction': str(prediction),
+                                     'confidence': float(confidence),
+                                     'probabilities': probabilities,
+                                     'trees_used': trees_used,
+                                     'model_version': model_version})
+                return
+            prediction, probabilities, confidence = predict_depression(payload, model_package)
+            explanation = explain_depression(payload, model_package, str(prediction))
+            self.send_json(200, {'prediction': str(prediction),
+                                 'confidence': float(confidence),
+                                 'probabilities': probabilities,
+                                 'contributions': explanation['contributions'] if explanation else None,
+                                 'model_version': model_version})
+            return
+
+        records = payload.get('records') if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            self.send_json(400, {'error': 'Expected a list of symptom objects'})
+            return
+        if len(records) > MAX_BATCH_ROWS:
+            self.send_json(413, {'error': f'At most {MAX_BATCH_ROWS} records per batch'})
+            return
+        for i, record in enumerate(records):
+            key = non_scalar_field(record)
+            if key is not None:
+                self.send_json(400, {'error': f'Record {i}: {key!r} must be a string, number or boolean'})
+                return
+
+        results = []
+        for chunk in predict_depression_batch(records, model_package):
+            probability_columns = [c for c in chunk.columns if c.startswith('probability_')]
+            for row in chunk[['predicted_type', 'confidence'] + probability_columns].itertuples(index=False):
+                results.append({
+                    'prediction': row[0],
+                    'confidence': float(row[1]),
+                    'probabilities': {c[len('probability_'):]: float(p)
+                                      for c, p in zip(probability_columns, row[2:])},
+                })
+        self.send_json(200, {'predictions': results, 'model_version': model_version})
+
+class ScoringServer(ThreadingMixIn, HTTPServer):
+    """One worker: threads per connection on a listening socket shared with siblings"""
+
+    daemon_threads = True
+
+    def __init__(self, listen_socket, registry, db_path=DB_PATH, request_timeout=REQUEST_TIMEOUT):
+        super().__init__(listen_socket.getsockname()[:2], ScoringHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listen_socket
+        self.registry = registry
+        self.db_path = db_path
+        self.request_timeout = request_timeout
+
+def run_worker(listen_socket, model_path, db_path, request_timeout, registry_dir=REGISTRY_DIR):
+    """Load the model once and serve requests until the process is stopped"""
+    try:
+        registry = ModelRegistry(registry_dir, fallback_path=model_path).start_watcher()
+    except FileNotFoundError:
+        print(f"❌ [{os.getpid()}] Model file not found: {model_path}")
+        registry = None
+    server = ScoringServer(listen_socket, registry, db_path, request_timeout)
+    server.serve_forever()
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, workers=2, model_path=MODEL_PATH,
+          db_path=DB_PATH, request_timeout=REQUEST_TIMEOUT, registry_dir=REGISTRY_DIR):
+    """Bind once, fork the worker pool and restart workers that exit"""
+    listen_socket = socket.create_server((host, port), backlog=128)
+    print(f"✅ Scoring service listening on http://{host}:{port} with {workers} workers")
+
+    if not hasattr(os, 'fork'):
+        # No fork on Windows; serve from this process
+        run_worker(listen_socket, model_path, db_path, request_timeout, registry_dir)
+        return
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(listen_socket, model_path, db_path, request_timeout, registry_dir)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited; starting a replacement")
+            spawn()
+    listen_socket.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve depression predictions over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--model', default=MODEL_PATH, help="Model package to serve when the registry is empty")
+    parser.add_argument('--registry', default=REGISTRY_DIR, help="Versioned model registry to serve and watch")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database with the precautions table")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT,
+                        help="Socket timeout in seconds for reads and idle keep-alive connections")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.model, args.db, args.timeout, args.registry)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# summary_stats.py - Summary tables behind the Statistics page, kept current by triggers
+
+import argparse
+import sys
+from sqlite3 import Error
+from database import DB_PATH, SYMPTOM_COLUMNS, create_connection
+
+SYMPTOM_FIELDS = list(SYMPTOM_COLUMNS.values())
+
+def _symptom_updates(sign, row):
+    return ', '.join(f"{c} = {c} {sign} COALESCE({row}.{c}, 0)" for c in SYMPTOM_FIELDS)
+
+def _mask_updates(sign, row):
+    return ', '.join(f"{c} = {c} {sign} (({row}.symptom_mask >> {bit}) & 1)" for bit, c in enumerate(SYMPTOM_FIELDS))
+
+# Triggers update the summaries in the same transaction as the row change,
+# so they are right whichever process or script writes
+SUMMARY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS stats_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        predictions INTEGER NOT NULL DEFAULT 0,
+        symptoms INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_by_type (
+        predicted_type TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS stats_symptom_sums (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        {', '.join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in SYMPTOM_FIELDS)}
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_daily (
+        day TEXT PRIMARY KEY,
+        predictions INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "INSERT OR IGNORE INTO stats_totals (id) VALUES (1)",
+    "INSERT OR IGNORE INTO stats_symptom_sums (id) VALUES (1)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_prediction_insert AFTER INSERT ON predictions
+    BEGIN
+        UPDATE stats_totals SET predictions = predictions + 1 WHERE id = 1;
+        INSERT INTO stats_by_type (predicted_type, count) VALUES (NEW.predicted_type, 1)
+            ON CONFLICT (predicted_type) DO UPDATE SET count = count + 1;
+        INSERT INTO stats_daily (day, predictions) VALUES (COALESCE(date(NEW.timestamp), date('now')), 1)
+            ON CONFLICT (day) DO UPDATE SET predictions = predictions + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_prediction_delete AFTER DELETE ON predictions
+    BEGIN
+        UPDATE stats_totals SET predictions = predictions - 1 WHERE id = 1;
+        UPDATE stats_by_type SET count = count - 1 WHERE predicted_type IS OLD.predicted_type;
+        UPDATE stats_daily SET predictions = predictions - 1
+            WHERE day = COALESCE(date(OLD.timestamp), date('now'));
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_prediction_type_update AFTER UPDATE OF predicted_type ON predictions
+    WHEN OLD.predicted_type IS NOT NEW.predicted_type
+    BEGIN
+        UPDATE stats_by_type SET count = count - 1 WHERE predicted_type IS OLD.predicted_type;
+        INSERT INTO stats_by_type (predicted_type, count) VALUES (NEW.predicted_type, 1)
+            ON CONFLICT (predicted_type) DO UPDATE SET count = count + 1;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_symptoms_insert AFTER INSERT ON symptoms
+    BEGIN
+        UPDATE stats_totals SET symptoms = symptoms + 1 WHERE id = 1;
+        UPDATE stats_symptom_sums SET {_symptom_updates('+', 'NEW')} WHERE id = 1;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_symptoms_delete AFTER DELETE ON symptoms
+    BEGIN
+        UPDATE stats_totals SET symptoms = symptoms - 1 WHERE id = 1;
+        UPDATE stats_symptom_sums SET {_symptom_updates('-', 'OLD')} WHERE id = 1;
+    END
+    ''',
+]
+
+# The symptom triggers once symptoms are stored as bitmasks (migration 7)
+MASK_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_symptom_mask_insert AFTER INSERT ON assessment_symptoms
+    BEGIN
+        UPDATE stats_totals SET symptoms = symptoms + 1 WHERE id = 1;
+        UPDATE stats_symptom_sums SET {_mask_updates('+', 'NEW')} WHERE id = 1;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_symptom_mask_delete AFTER DELETE ON assessment_symptoms
+    BEGIN
+        UPDATE stats_totals SET symptoms = symptoms - 1 WHERE id = 1;
+        UPDATE stats_symptom_sums SET {_mask_updates('-', 'OLD')} WHERE id = 1;
+    END
+    ''',
+]
+
+def create_summary_tables(conn):
+    """Create the summary tables and their triggers, then fill them from the data"""
+    for statement in SUMMARY_SCHEMA:
+        conn.execute(statement)
+    rebuild(conn)
+
+def create_mask_triggers(conn):
+    """Keep the symptom summaries current from assessment_symptoms"""
+    for statement in MASK_TRIGGERS:
+        conn.execute(statement)
+
+def rebuild(conn):
+    """Recompute every summary from the full tables (the caller commits)"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM stats_by_type")
+    cursor.execute("DELETE FROM stats_daily")
+    cursor.execute('''
+    UPDATE stats_totals SET
+        predictions = (SELECT COUNT(*) FROM predictions),
+        symptoms = (SELECT COUNT(*) FROM symptoms)
+    WHERE id = 1
+    ''')
+    cursor.execute('''
+    INSERT INTO stats_by_type (predicted_type, count)
+    SELECT predicted_type, COUNT(*) FROM predictions GROUP BY predicted_type
+    ''')
+    cursor.execute('''
+    INSERT INTO stats_daily (day, predictions)
+    SELECT COALESCE(date(timestamp), date('now')), COUNT(*) FROM predictions GROUP BY 1
+    ''')
+    cursor.execute(f'''
+    UPDATE stats_symptom_sums SET ({', '.join(SYMPTOM_FIELDS)}) = (
+        SELECT {', '.join(f"COALESCE(SUM({c}), 0)" for c in SYMPTOM_FIELDS)} FROM symptoms
+    )
+    WHERE id = 1
+    ''')
+
+def fetch_statistics(conn):
+    """Totals, counts per predicted type (largest first) and symptom sums from the summary rows"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT predictions FROM stats_totals WHERE id = 1")
+    total = cursor.fetchone()
+    cursor.execute('''
+    SELECT predicted_type, count FROM stats_by_type
+    WHERE count > 0
+    ORDER BY count DESC
+    ''')
+    predictions_by_type = cursor.fetchall()
+    cursor.execute(f"SELECT {', '.join(SYMPTOM_FIELDS)} FROM stats_symptom_sums WHERE id = 1")
+    symptom_counts = cursor.fetchone()
+    return {
+        'total_predictions': total[0] if total else 0,
+        'predictions_by_type': predictions_by_type,
+        'symptom_counts': tuple(int(x) for x in symptom_counts) if symptom_counts else (0,) * len(SYMPTOM_FIELDS),
+    }
+
+def fetch_daily(conn, days=30):
+    """Assessments per day for the last ``days`` days with any, oldest first"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT day, predictions FROM (
+        SELECT day, predictions FROM stats_daily WHERE predictions > 0 ORDER BY day DESC LIMIT ?
+    ) ORDER BY day
+    ''', (days,))
+    return cursor.fetchall()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statistics summary tables")
+    parser.add_argument('command', choices=['rebuild', 'show'],
+                        help="Recompute the summaries from the full tables, or print them")
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args(argv)
+
+    try:
+        conn = create_connection(args.db)
+        try:
+            if args.command == 'rebuild':
+                conn.execute("BEGIN IMMEDIATE")
+                rebuild(conn)
+                conn.commit()
+            stats = fetch_statistics(conn)
+        finally:
+            conn.close()
+    except Error as e:
+        print(f"❌ {e} (has the database been migrated? run: python migrations.py)")
+        return 1
+
+    if args.command == 'rebuild':
+        print("✅ Summary tables rebuilt")
+    print(f"Total assessments: {stats['total_predictions']}")
+    for predicted_type, count in stats['predictions_by_type']:
+        print(f"  {predicted_type}: {count}")
+    for column, count in zip(SYMPTOM_FIELDS, stats['symptom_counts']):
+        print(f"  {column}: {count}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+# test_model_artifact.py - The memory-mapped artifact keeps everything the .pkl package has
+
+import os
+import joblib
+import numpy as np
+from drift_monitor import package_reference_profile
+from model_artifact import artifact_path
+from predictor import MODEL_PATH, enumerate_inputs, load_model_package
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_reference_profile_survives_artifact_reload(tmp_path):
+    model_package = joblib.load(os.path.join(REPO_DIR, MODEL_PATH))
+    X = enumerate_inputs(list(model_package['feature_names'])).to_numpy(dtype=np.float64)
+    weights = np.arange(1, len(X) + 1)
+    model_package['reference_profile'] = package_reference_profile(model_package, X, weights)
+    model_path = str(tmp_path / 'model.pkl')
+    joblib.dump(model_package, model_path)
+
+    # The first load reads the .pkl and writes the artifact; the second reads the artifact
+    first = load_model_package(model_path)
+    assert os.path.isdir(artifact_path(model_path))
+    second = load_model_package(model_path)
+    assert second['model'] is None
+
+    assert first['reference_profile'] == model_package['reference_profile']
+    assert second['reference_profile'] == model_package['reference_profile']
@@ -0,0 +1,670 @@
+# train_model.py - Command-line training pipeline (replaces depression_model.ipynb)
+
+import argparse
+import hashlib
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, ParameterGrid, StratifiedKFold
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.validation import has_fit_parameter
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.metrics import classification_report, accuracy_score, f1_score
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.svm import SVC
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+from imblearn.over_sampling import SMOTE
+from drift_monitor import package_reference_profile
+import warnings
+warnings.filterwarnings('ignore')
+
+MODEL_PATH = 'depression_prediction_model.pkl'
+CACHE_DIR = '.train_cache'
+RANDOM_STATE = 42
+TEST_SIZE = 0.2
+CV_FOLDS = 5
+
+# Successive halving: keep the best 1/HALVING_FACTOR of the configurations per round
+# and drop any that trail the round's leader by more than DROP_MARGIN accuracy
+HALVING_FACTOR = 3
+DROP_MARGIN = 0.05
+MIN_ESTIMATORS = 10
+
+# Bump when preprocessing changes so stale cached matrices are not reused
+PREPROCESS_VERSION = 4
+
+# Rows read at a time when collapsing the dataset into distinct weighted rows
+READ_CHUNK_ROWS = 100000
+SMOTE_NEIGHBORS = 5
+
+BINARY_COLS = ['Feelinghopeless', 'lossofinterest', 'appetitechange',
+               'distrubedsleepcycle', 'low energy', 'lackofconcentration',
+               'suicidalthoughts', 'temperoutburst', 'panicattack',
+               'moodswing', 'medicalissue']
+
+PARAM_GRIDS = {
+    'Random Forest': {
+        'n_estimators': [100, 200, 300],
+        'max_depth': [10, 20, 30, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4]
+    },
+    'XGBoost': {
+        'n_estimators': [100, 200],
+        'max_depth': [3, 5, 7],
+        'learning_rate': [0.01, 0.1, 0.2],
+        'subsample': [0.8, 0.9, 1.0]
+    },
+    'Gradient Boosting': {
+        'n_estimators': [100, 200],
+        'learning_rate': [0.01, 0.1, 0.2],
+        'max_depth': [3, 5, 7]
+    }
+}
+
+def section(title):
+    print("\n" + "=" * 50)
+    print(title)
+    print("=" * 50)
+
+def candidate_models(random_state=RANDOM_STATE):
+    """The classifiers compared in the notebook (XGBoost only if installed)"""
+    models = {
+        'Random Forest': RandomForestClassifier(random_state=random_state),
+        'Gradient Boosting': GradientBoostingClassifier(random_state=random_state),
+        'SVM': SVC(random_state=random_state),
+        'Logistic Regression': LogisticRegression(random_state=random_state, max_iter=1000),
+        'K-Nearest Neighbors': KNeighborsClassifier(),
+        'Decision Tree': DecisionTreeClassifier(random_state=random_state)
+    }
+    try:
+        from xgboost import XGBClassifier
+        models['XGBoost'] = XGBClassifier(random_state=random_state, eval_metric='mlogloss')
+    except ImportError:
+        print("⚠️ xgboost is not installed; skipping XGBoost")
+    return models
+
+def preprocess(df):
+    """Y/N mapping, label encoding and Age one-hot, as in the notebook"""
+    df = df.copy()
+    for col in BINARY_COLS:
+        df[col] = df[col].map({'Y': 1, 'N': 0})
+
+    label_encoder = LabelEncoder()
+    df['type_encoded'] = label_encoder.fit_transform(df['type'])
+    df = pd.get_dummies(df, columns=['Age'], prefix='Age', dtype=int)
+    df = df.drop('type', axis=1)
+
+    X = df.drop('type_encoded', axis=1)
+    y = df['type_encoded']
+    return X, y, label_encoder
+
+def count_rows(chunks, counts=None):
+    """Fold DataFrame chunks into distinct-row counts (a Series indexed by the row values)"""
+    for chunk in chunks:
+        chunk_counts = chunk.value_counts(dropna=False, sort=False)
+        if counts is None:
+            counts = chunk_counts
+        else:
+            counts = pd.concat([counts, chunk_counts])
+            counts = counts.groupby(level=list(range(counts.index.nlevels)), dropna=False, sort=False).sum()
+    return counts
+
+def read_weighted(data_path, chunk_rows=READ_CHUNK_ROWS):
+    """Read the CSV in chunks as distinct rows plus how often each occurs"""
+    counts = count_rows(pd.read_csv(data_path, chunksize=chunk_rows))
+    df = counts.index.to_frame(index=False)
+    return df, counts.to_numpy(dtype=np.int64), int(counts.sum())
+
+def collapse(X, y, w):
+    """Merge identical (features, label) rows, summing their weights"""
+    keys = np.column_stack([X, y])
+    keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return keys[:, :-1], keys[:, -1].astype(np.int64), np.bincount(inverse.ravel(), weights=w).astype(np.int64)
+
+def weighted_smote(X, y, w, random_state=RANDOM_STATE, k_neighbors=SMOTE_NEIGHBORS):
+    """SMOTE on distinct rows with integer weights
+
+    Raises every class to the majority's total weight, as SMOTE does with row
+    counts. Seeds are drawn in proportion to weight and neighbours are the
+    k nearest samples counting duplicates, as SMOTE would pick them on the
+    expanded data, and synthetic samples are cast back to X's dtype as
+    imblearn's SMOTE does (0/1 integer features are truncated). Every
+    synthetic sample is a row of its own with weight 1; only those identical
+    to another row are merged with it, as duplicates on the expanded data.
+    """
+    rng = np.random.default_rng(random_state)
+    X = np.asarray(X)
+    totals = np.bincount(y, weights=w).astype(np.int64)
+    parts = [(X, y, w)]
+    for cls in np.flatnonzero(totals):
+        deficit = int(totals.max() - totals[cls])
+        if not deficit:
+            continue
+        idx = np.flatnonzero(y == cls)
+        Xc, wc = X[idx], w[idx]
+
+        # Rows are distinct within a class, so each row is its own nearest neighbour
+        n_neighbors = min(k_neighbors + 1, len(idx))
+        neighbors = NearestNeighbors(n_neighbors=n_neighbors).fit(Xc).kneighbors(Xc, return_distance=False)
+        units = wc[neighbors].astype(np.float64)
+        units[:, 0] -= 1
+        taken = np.clip(k_neighbors - (np.cumsum(units, axis=1) - units), 0, units)
+        taken[taken.sum(axis=1) == 0, 0] = 1
+        cumulative = np.cumsum(taken / taken.sum(axis=1, keepdims=True), axis=1)
+
+        seeds = rng.choice(len(idx), size=deficit, p=wc / wc.sum())
+        column = (rng.random((deficit, 1)) > cumulative[seeds]).sum(axis=1).clip(max=n_neighbors - 1)
+        partners = neighbors[seeds, column]
+        synthetic = Xc[seeds] + rng.random((deficit, 1)) * (Xc[partners] - Xc[seeds])
+        synthetic = synthetic.astype(X.dtype)
+        parts.append((synthetic, np.full(deficit, cls, dtype=np.int64), np.ones(deficit, dtype=np.int64)))
+
+    return collapse(*(np.concatenate(arrays) for arrays in zip(*parts)))
+
+def split_weights(y, w, fraction, rng):
+    """Draw a stratified fraction of the weighted rows without replacement; returns drawn counts"""
+    drawn = np.zeros_like(w)
+    for cls in np.unique(y):
+        idx = np.flatnonzero(y == cls)
+        drawn[idx] = rng.multivariate_hypergeometric(w[idx], int(round(fraction * w[idx].sum())))
+    return drawn
+
+def make_folds(y, w=None, n_folds=CV_FOLDS, random_state=RANDOM_STATE):
+    """Stratified CV folds as (train_idx, test_idx, train_w, test_w)
+
+    Unweighted folds are StratifiedKFold's, as GridSearchCV and cross_val_score
+    use. Weighted folds split each row's count across folds, like a shuffled
+    StratifiedKFold on the expanded data.
+    """
+    if w is None:
+        return [(train, test, None, None) for train, test in StratifiedKFold(n_folds).split(np.zeros(len(y)), y)]
+    rng = np.random.default_rng(random_state)
+    remaining = w.copy()
+    folds = []
+    for f in range(n_folds):
+        drawn = split_weights(y, remaining, 1 / (n_folds - f), rng)
+        remaining -= drawn
+        rest = w - drawn
+        train, test = np.flatnonzero(rest), np.flatnonzero(drawn)
+        folds.append((train, test, rest[train], drawn[test]))
+    return folds
+
+def weighted_leaf_params(model, total_weight):
+    """min_samples_leaf restated as min_weight_fraction_leaf, so it counts repeated rows
+
+    Returns the parameters to set, or {} when there is nothing to convert.
+    """
+    params = model.get_params()
+    leaf = params.get('min_samples_leaf', 1)
+    if leaf == 1 or 'min_weight_fraction_leaf' not in params:
+        return {}
+    fraction = leaf if isinstance(leaf, float) else leaf / total_weight
+    return {'min_samples_leaf': 1,
+            'min_weight_fraction_leaf': min(max(params['min_weight_fraction_leaf'], fraction), 0.5)}
+
+def fit_tree(tree, X, y, counts):
+    return tree.fit(X, y, sample_weight=counts)
+
+def grow_forest(model, X, y, w, n_trees, random_state=RANDOM_STATE):
+    """Add n_trees to a bagged forest (fitted or not), each on a bootstrap drawn from w
+
+    sklearn would draw its bootstrap uniformly over the distinct rows, so each
+    tree gets multinomial counts from w as its sample weights instead. The
+    first tree of an unfitted forest goes through the forest's own fit (with
+    warm_start) to set it up; the rest are fitted on model.n_jobs threads.
+    """
+    if model.get_params().get('class_weight') is not None:
+        raise ValueError("Weighted bootstraps do not support class_weight; train with --no-dedup")
+    rng = np.random.default_rng(random_state)
+    params = model.get_params()
+    total = int(w.sum())
+    p = w / total
+    model.set_params(bootstrap=False, warm_start=True, **weighted_leaf_params(model, total))
+    if not hasattr(model, 'estimators_'):
+        model.set_params(n_estimators=1)
+        model.fit(X, y, sample_weight=rng.multinomial(total, p))
+        n_trees -= 1
+    # A fitted forest's first tree keeps the leaf sizes it was fitted with, so
+    # the new trees take the ones just converted for this total weight
+    template = clone(model.estimators_[0]).set_params(
+        **{name: model.get_params()[name] for name in ('min_samples_leaf', 'min_weight_fraction_leaf')})
+    seeds = rng.integers(np.iinfo(np.int32).max, size=n_trees)
+    # Bootstraps are drawn as trees are dispatched rather than all up front
+    trees = Parallel(n_jobs=model.n_jobs, prefer='threads')(
+        delayed(fit_tree)(clone(template).set_params(random_state=int(seed)), X, y, rng.multinomial(total, p))
+        for seed in seeds)
+    model.estimators_.extend(trees)
+    return model.set_params(**{name: params[name] for name in
+                               ('bootstrap', 'warm_start', 'min_samples_leaf', 'min_weight_fraction_leaf')},
+                            n_estimators=len(model.estimators_))
+
+def fit_weighted(model, X, y, w=None, random_state=RANDOM_STATE):
+    """Fit on distinct rows, row i standing for w[i] repeated rows
+
+    Bagged forests go through grow_forest(); other models with sample_weight
+    get w as weights, with min_samples_leaf restated as a fraction of the
+    total weight. This approximates fitting the repeated rows rather than
+    reproducing it: min_samples_split still counts distinct rows, and ties
+    and random draws fall differently. Models without sample_weight (KNN)
+    are fitted on the repeated rows, shuffled so neighbour ties do not favour
+    whichever label comes first, and gain nothing from the weights.
+    """
+    if w is None:
+        return model.fit(X, y)
+    params = model.get_params()
+    if params.get('bootstrap') and 'warm_start' in params:
+        return grow_forest(model, X, y, w, params['n_estimators'], random_state)
+    if has_fit_parameter(model, 'sample_weight'):
+        leaf_params = weighted_leaf_params(model, w.sum())
+        model.set_params(**leaf_params).fit(X, y, sample_weight=w)
+        return model.set_params(**{name: params[name] for name in leaf_params})
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(int(w.sum()))
+    return model.fit(np.repeat(X, w, axis=0)[order], np.repeat(y, w)[order])
+
+def data_fingerprint(data_path, random_state, test_size, dedup=True):
+    """Cache key: hash of the input file plus everything that shapes the matrices"""
+    digest = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(f'{PREPROCESS_VERSION}:{random_state}:{test_size}:{dedup}'.encode())
+    return digest.hexdigest()[:16]
+
+def prepare_data(data_path, cache_dir=CACHE_DIR, random_state=RANDOM_STATE, test_size=TEST_SIZE, dedup=True):
+    """Preprocess, SMOTE, split and scale, reusing cached matrices for unchanged data
+
+    With dedup, identical (features, type) rows are collapsed into distinct
+    rows with counts first, and SMOTE, the split and the scaler work on those
+    weights; the w_* entries are None otherwise.
+    """
+    cache_path = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        fingerprint = data_fingerprint(data_path, random_state, test_size, dedup)
+        cache_path = os.path.join(cache_dir, f'{fingerprint}.joblib')
+        if os.path.exists(cache_path):
+            print(f"Using cached preprocessed data: {cache_path}")
+            return joblib.load(cache_path)
+
+    print(f"Loading dataset: {data_path}")
+    if dedup:
+        df, counts, n_rows = read_weighted(data_path)
+        print(f"Dataset shape: {(n_rows, df.shape[1])}, {len(df)} distinct rows")
+    else:
+        df = pd.read_csv(data_path)
+        print(f"Dataset shape: {df.shape}")
+
+    X, y, label_encoder = preprocess(df)
+    print(f"Target classes: {label_encoder.classes_}")
+
+    # Distinct pre-SMOTE rows describe the real population for drift monitoring
+    if dedup:
+        reference_X, reference_w = X.to_numpy(dtype=np.float64), counts
+    else:
+        reference_X, reference_w = np.unique(X.to_numpy(dtype=np.float64), axis=0, return_counts=True)
+
+    print("Applying SMOTE to handle class imbalance...")
+    if dedup:
+        X_resampled, y_resampled, w_resampled = weighted_smote(
+            X.to_numpy(), y.to_numpy(dtype=np.int64), counts, random_state)
+        print(f"After SMOTE - {w_resampled.sum()} samples as {len(y_resampled)} distinct rows")
+
+        test_w = split_weights(y_resampled, w_resampled, test_size, np.random.default_rng(random_state))
+        train_w = w_resampled - test_w
+        train, test = np.flatnonzero(train_w), np.flatnonzero(test_w)
+        X_train = pd.DataFrame(X_resampled[train], columns=X.columns)
+        X_test = pd.DataFrame(X_resampled[test], columns=X.columns)
+        y_train, y_test = y_resampled[train], y_resampled[test]
+        w_train, w_test = train_w[train], test_w[test]
+    else:
+        X_resampled, y_resampled = SMOTE(random_state=random_state).fit_resample(X, y)
+        print(f"After SMOTE - Features shape: {X_resampled.shape}")
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_resampled, y_resampled, test_size=test_size, random_state=random_state, stratify=y_resampled
+        )
+        w_resampled = w_train = w_test = None
+
+    scaler = StandardScaler()
+    data = {
+        'feature_names': list(X.columns),
+        'label_encoder': label_encoder,
+        'scaler': scaler,
+        'X_resampled': np.asarray(X_resampled),
+        'y_resampled': np.asarray(y_resampled),
+        'w_resampled': w_resampled,
+        'X_train_scaled': scaler.fit(X_train, sample_weight=w_train).transform(X_train),
+        'X_test_scaled': scaler.transform(X_test),
+        'y_train': np.asarray(y_train),
+        'y_test': np.asarray(y_test),
+        'w_train': w_train,
+        'w_test': w_test,
+        'reference_X': reference_X,
+        'reference_w': reference_w,
+    }
+    if cache_path:
+        joblib.dump(data, cache_path)
+    return data
+
+def fit_and_score(name, model, X_train, y_train, X_test, y_test, w_train=None, w_test=None):
+    """Train one candidate and score it on the test split (runs in a worker process)"""
+    start = time.perf_counter()
+    fit_weighted(model, X_train, y_train, w_train)
+    y_pred = model.predict(X_test)
+    return {
+        'name': name,
+        'model': model,
+        'accuracy': accuracy_score(y_test, y_pred, sample_weight=w_test),
+        'f1_score': f1_score(y_test, y_pred, average='weighted', sample_weight=w_test),
+        'y_pred': y_pred,
+        'seconds': time.perf_counter() - start,
+    }
+
+def compare_models(models, data, workers=None):
+    """Train all candidates at the same time in a process pool"""
+    args = (data['X_train_scaled'], data['y_train'], data['X_test_scaled'], data['y_test'],
+            data['w_train'], data['w_test'])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_and_score, name, model, *args) for name, model in models.items()]
+        results = {}
+        for future in futures:
+            result = future.result()
+            results[result['name']] = result
+            print(f"{result['name']} - Accuracy: {result['accuracy']:.4f}, "
+                  f"F1-Score: {result['f1_score']:.4f} ({result['seconds']:.1f}s)")
+    return results
+
+def fold_scores(model, X, y, folds, workers=1):
+    """Accuracy of model on each CV fold from make_folds()"""
+    X = np.asarray(X)
+    y = np.asarray(y)
+
+    def score_fold(train, test, w_train, w_test):
+        fitted = fit_weighted(clone(model), X[train], y[train], w_train)
+        return accuracy_score(y[test], fitted.predict(X[test]), sample_weight=w_test)
+
+    return np.array(Parallel(n_jobs=workers)(delayed(score_fold)(*fold) for fold in folds))
+
+def score_candidate(model, params, X, y, folds):
+    """Mean CV accuracy of one configuration (runs in a worker)"""
+    return float(fold_scores(clone(model).set_params(**params), X, y, folds).mean())
+
+def grid_search(model, param_grid, X, y, workers=None, w=None):
+    """Exhaustive search with GridSearchCV's folds and tie-breaking, as in the notebook"""
+    start = time.perf_counter()
+    candidates = list(ParameterGrid(param_grid))
+    print(f"Fitting {CV_FOLDS} folds for each of {len(candidates)} candidates, "
+          f"totalling {CV_FOLDS * len(candidates)} fits")
+    folds = make_folds(y, w)
+    scores = Parallel(n_jobs=workers or -1)(
+        delayed(score_candidate)(model, params, X, y, folds) for params in candidates)
+    best = int(np.argmax(scores))
+    return {
+        'estimator': fit_weighted(clone(model).set_params(**candidates[best]), X, y, w),
+        'params': candidates[best],
+        'cv_score': scores[best],
+        'n_fits': len(candidates) * CV_FOLDS + 1,
+        'seconds': time.perf_counter() - start,
+        'rounds': [],
+        'budget_exhausted': False,
+    }
+
+def halving_schedule(max_resource, min_resource, n_candidates, factor=HALVING_FACTOR):
+    """Resource per round, growing by factor and ending at max_resource"""
+    n_rounds = min(int(math.log(max_resource / min_resource, factor)) + 1,
+                   math.ceil(math.log(n_candidates, factor)) + 1)
+    return [max(int(max_resource / factor ** (n_rounds - 1 - i)), min_resource) for i in range(n_rounds)]
+
+def refit_seconds(round_, max_resource, workers=None):
+    """Estimated time of the final single fit at max_resource, from a finished halving round
+
+    Candidates run in parallel and each fits CV_FOLDS folds on (CV_FOLDS - 1)/CV_FOLDS
+    of the data, so one candidate's share of the round is scaled up to the whole resource.
+    """
+    jobs = min(workers or os.cpu_count() or 1, round_['n_candidates'])
+    per_candidate = round_['seconds'] * jobs / round_['n_candidates']
+    return per_candidate * max_resource / ((CV_FOLDS - 1) * round_['resource'])
+
+def successive_halving(model, param_grid, X, y, workers=None, resource='auto',
+                       time_budget=None, factor=HALVING_FACTOR, drop_margin=DROP_MARGIN,
+                       random_state=RANDOM_STATE, w=None):
+    """Successive halving over n_estimators or training-sample size under a time budget
+
+    Every configuration is cross-validated on a small resource first; each round
+    keeps the best 1/factor (minus any trailing the leader by more than
+    drop_margin) and multiplies the resource by factor. When time_budget
+    seconds run out, or the next round is not expected to fit, the leader of
+    the last finished round wins. The budget includes the final refit on all
+    the data: an estimate of it (refit_seconds()) is held back from each round.
+    """
+    start = time.perf_counter()
+    X = np.asarray(X)
+    y = np.asarray(y)
+    if resource == 'auto':
+        resource = 'n_estimators' if 'n_estimators' in param_grid else 'n_samples'
+
+    param_grid = dict(param_grid)
+    if resource == 'n_estimators':
+        max_resource = max(param_grid.pop('n_estimators', [model.get_params()['n_estimators']]))
+        min_resource = min(MIN_ESTIMATORS, max_resource)
+    else:
+        max_resource = len(y) if w is None else int(w.sum())
+        min_resource = min(CV_FOLDS * len(np.unique(y)) * 4, max_resource)
+    candidates = list(ParameterGrid(param_grid))
+    schedule = halving_schedule(max_resource, min_resource, len(candidates), factor)
+    print(f"Successive halving over {resource}: {len(candidates)} configurations, "
+          f"resources per round {schedule}")
+
+    rounds = []
+    best = None
+    n_fits = 0
+    budget_exhausted = False
+    for i, r in enumerate(schedule):
+        if i == len(schedule) - 1:
+            # Final round trains on everything so the leader is judged at full size
+            r = max_resource
+        if rounds and time_budget is not None:
+            previous = rounds[-1]
+            expected = previous['seconds'] * (len(candidates) * r) / (previous['n_candidates'] * previous['resource'])
+            reserve = refit_seconds(previous, max_resource, workers)
+            if time.perf_counter() - start + expected + reserve > time_budget:
+                budget_exhausted = True
+                print(f"⚠️ Time budget of {time_budget:.0f}s reached; stopping after round {len(rounds)}")
+                break
+
+        round_start = time.perf_counter()
+        if resource == 'n_estimators':
+            configs = [dict(params, n_estimators=r) for params in candidates]
+            X_r, y_r, w_r = X, y, w
+        else:
+            configs = candidates
+            if r >= max_resource:
+                X_r, y_r, w_r = X, y, w
+            elif w is None:
+                X_r, _, y_r, _ = train_test_split(X, y, train_size=r, stratify=y, random_state=random_state)
+                w_r = None
+            else:
+                drawn = split_weights(y, w, r / max_resource, np.random.default_rng(random_state))
+                kept = np.flatnonzero(drawn)
+                X_r, y_r, w_r = X[kept], y[kept], drawn[kept]
+        folds = make_folds(y_r, w_r)
+        scores = []
+        jobs = Parallel(n_jobs=workers or -1, return_as='generator')(
+            delayed(score_candidate)(model, params, X_r, y_r, folds) for params in configs)
+        for score in jobs:
+            scores.append(score)
+            if time_budget is None:
+                continue
+            # The candidates scored so far give the refit estimate, even in the first round
+            so_far = {'seconds': time.perf_counter() - round_start, 'n_candidates': len(scores), 'resource': r}
+            reserve = refit_seconds(so_far, max_resource, workers)
+            next_score = so_far['seconds'] / len(scores)
+            if time.perf_counter() - start + next_score + reserve > time_budget:
+                budget_exhausted = True
+                break
+        n_fits += len(scores) * CV_FOLDS
+        if budget_exhausted and rounds:
+            print(f"⚠️ Time budget of {time_budget:.0f}s reached during round {len(rounds) + 1}; "
+                  f"keeping the leader of round {len(rounds)}")
+            break
+
+        order = np.argsort(scores)[::-1]
+        best = (configs[order[0]], scores[order[0]])
+        rounds.append({'resource': r, 'n_candidates': len(scores), 'best_score': best[1],
+                       'seconds': time.perf_counter() - round_start})
+        print(f"Round {len(rounds)}: {len(scores)} configurations at {resource}={r}, "
+              f"best CV score {best[1]:.4f} ({rounds[-1]['seconds']:.1f}s)")
+        if budget_exhausted:
+            print(f"⚠️ Time budget of {time_budget:.0f}s reached; "
+                  f"only {len(scores)} of {len(configs)} configurations were scored")
+            break
+
+        keep = max(1, math.ceil(len(candidates) / factor))
+        candidates = [candidates[j] for j in order[:keep] if scores[j] >= best[1] - drop_margin]
+        if len(candidates) == 1 and i < len(schedule) - 1:
+            # A single survivor only needs its final fit
+            break
+
+    params = dict(best[0])
+    if resource == 'n_estimators':
+        params['n_estimators'] = max_resource
+    estimator = fit_weighted(clone(model).set_params(**params), X, y, w)
+    return {
+        'estimator': estimator,
+        'params': params,
+        'cv_score': best[1],
+        'n_fits': n_fits + 1,
+        'seconds': time.perf_counter() - start,
+        'rounds': rounds,
+        'budget_exhausted': budget_exhausted,
+    }
+
+def tune_model(name, model, data, workers=None, search='halving', resource='auto', time_budget=None):
+    """Tune the best model's hyperparameters; returns None for models without a grid"""
+    param_grid = PARAM_GRIDS.get(name)
+    if not param_grid:
+        print(f"Skipping hyperparameter tuning for {name}")
+        return None
+
+    X, y, w = data['X_train_scaled'], data['y_train'], data['w_train']
+    if search == 'grid':
+        print(f"Performing grid search for {name}...")
+        result = grid_search(model, param_grid, X, y, workers, w)
+    else:
+        print(f"Performing successive halving search for {name}...")
+        result = successive_halving(model, param_grid, X, y, workers, resource, time_budget, w=w)
+    print(f"Best parameters: {result['params']}")
+    print(f"Best cross-validation score: {result['cv_score']:.4f}")
+    print(f"Search took {result['seconds']:.1f}s for {result['n_fits']} fits")
+    return result
+
+def compare_searches(name, model, data, halving, workers=None):
+    """Run the full grid as well and report how much faster and how much worse halving is"""
+    print(f"Performing full grid search for {name} to compare...")
+    grid = grid_search(model, PARAM_GRIDS[name], data['X_train_scaled'], data['y_train'], workers, data['w_train'])
+    rows = []
+    for label, result in (('Grid search', grid), ('Successive halving', halving)):
+        y_pred = result['estimator'].predict(data['X_test_scaled'])
+        rows.append({'Search': label, 'Fits': result['n_fits'], 'Seconds': round(result['seconds'], 1),
+                     'CV Accuracy': result['cv_score'], 'Test Accuracy': accuracy_score(data['y_test'], y_pred, sample_weight=data['w_test'])})
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    print(f"Speedup: {grid['seconds'] / halving['seconds']:.1f}x, "
+          f"test accuracy gap: {rows[0]['Test Accuracy'] - rows[1]['Test Accuracy']:+.4f}, "
+          f"CV accuracy gap: {grid['cv_score'] - halving['cv_score']:+.4f}")
+    return report
+
+def build_package(model, model_name, accuracy, data):
+    """The dictionary load_model() expects"""
+    package = {
+        'model': model,
+        'scaler': data['scaler'],
+        'label_encoder': data['label_encoder'],
+        'feature_names': data['feature_names'],
+        'target_names': list(data['label_encoder'].classes_),
+        'training_date': datetime.now(),
+        'model_name': model_name,
+        'accuracy': accuracy,
+    }
+    package['reference_profile'] = package_reference_profile(package, data['reference_X'], data['reference_w'])
+    return package
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the depression type classifier")
+    parser.add_argument('data', help="Training CSV with Y/N symptom columns, 'Age' and 'type'")
+    parser.add_argument('--output', default=MODEL_PATH, help="Where to write the model package")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="Preprocessed data cache ('' to disable)")
+    parser.add_argument('--workers', type=int, help="Processes for model comparison and tuning")
+    parser.add_argument('--no-tune', action='store_true', help="Skip hyperparameter tuning")
+    parser.add_argument('--search', choices=['halving', 'grid'], default='halving',
+                        help="Successive halving (default) or the notebook's exhaustive grid")
+    parser.add_argument('--resource', choices=['auto', 'n_estimators', 'n_samples'], default='auto',
+                        help="What successive halving grows between rounds")
+    parser.add_argument('--time-budget', type=float,
+                        help="Wall-clock limit in seconds for successive halving, including the final refit")
+    parser.add_argument('--compare-grid', action='store_true',
+                        help="Also run the full grid and report speedup and accuracy gap")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Train on every row instead of distinct rows with sample weights")
+    args = parser.parse_args(argv)
+
+    section("DATA PREPROCESSING")
+    data = prepare_data(args.data, args.cache_dir, dedup=not args.no_dedup)
+    target_names = data['label_encoder'].classes_
+
+    section("MODEL TRAINING AND EVALUATION")
+    results = compare_models(candidate_models(), data, args.workers)
+
+    section("MODEL COMPARISON")
+    results_df = pd.DataFrame({
+        'Model': list(results.keys()),
+        'Accuracy': [results[m]['accuracy'] for m in results],
+        'F1-Score': [results[m]['f1_score'] for m in results]
+    }).sort_values('Accuracy', ascending=False)
+    print(results_df.to_string(index=False))
+
+    section("HYPERPARAMETER TUNING")
+    best_model_name = results_df.iloc[0]['Model']
+    best_model = results[best_model_name]['model']
+    print(f"Best model: {best_model_name}")
+    if not args.no_tune:
+        tuned = tune_model(best_model_name, best_model, data, args.workers,
+                           args.search, args.resource, args.time_budget)
+        if tuned is not None:
+            if args.compare_grid and args.search == 'halving':
+                section("SEARCH COMPARISON")
+                compare_searches(best_model_name, best_model, data, tuned, args.workers)
+            best_model = tuned['estimator']
+
+    section("FINAL EVALUATION")
+    y_pred_final = best_model.predict(data['X_test_scaled'])
+    w_test = data['w_test']
+    final_accuracy = accuracy_score(data['y_test'], y_pred_final, sample_weight=w_test)
+    print(f"Final Model: {best_model_name}")
+    print(f"Accuracy: {final_accuracy:.4f}")
+    print(f"F1-Score: {f1_score(data['y_test'], y_pred_final, average='weighted', sample_weight=w_test):.4f}")
+    print(classification_report(data['y_test'], y_pred_final, target_names=target_names, sample_weight=w_test))
+
+    section("CROSS-VALIDATION")
+    folds = make_folds(data['y_resampled'], data['w_resampled'])
+    cv_scores = fold_scores(best_model, data['X_resampled'], data['y_resampled'], folds, args.workers or -1)
+    print(f"Cross-Validation Scores: {cv_scores}")
+    print(f"Mean CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
+
+    joblib.dump(build_package(best_model, best_model_name, final_accuracy, data), args.output)
+    print(f"\n✅ Model package saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,32 @@
 # view_database.py - Database Viewer
 
+import os
 import streamlit as st
 import pandas as pd
-import sqlite3
 from sqlite3 import Error
+from database import create_connection as pooled_connection
+from data_export import EXPORT_FORMATS, EXPORT_MAX_BYTES, PREVIEW_ROWS, table_query, count_rows, preview, export_to_tempfile
 
 def create_connection():
-    """Create a database connection"""
+    """Create a database connection (from the shared WAL connection pool)"""
     try:
-        conn = sqlite3.connect('depression_data.db')
+        conn = pooled_connection()
         return conn
     except Error as e:
         st.error(f"Error connecting to database: {e}")
     return None
 
+def prepare_export(conn, query, export_format, export_key):
+    """Stream an export to a temporary file kept for this session, replacing the previous one"""
+    previous = st.session_state.pop('export_file', None)
+    if previous and os.path.exists(previous['path']):
+        os.remove(previous['path'])
+    try:
+        path, rows = export_to_tempfile(conn, query, export_format)
+        st.session_state['export_file'] = {'key': export_key, 'path': path, 'rows': rows}
+    except (Error, OSError, RuntimeError) as e:
+        st.error(f"Error exporting data: {e}")
+
 def main():
     st.set_page_config(
         page_title="Database Viewer",
@@ -31,8 +44,8 @@ def main():
         if conn:
             cursor = conn.cursor()
             
-            # Get all table names
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+            # Get all table names (symptoms is a view over the bitmask table)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name")
             tables = cursor.fetchall()
             
             if tables:
@@ -50,18 +63,14 @@ def main():
                         cursor.execute(f"PRAGMA table_info({table_name})")
                         columns = cursor.fetchall()
                         
-                        # Get all data
-                        cursor.execute(f"SELECT * FROM {table_name}")
-                        data = cursor.fetchall()
+                        query = table_query(table_name)
+                        row_count = count_rows(conn, query)
                         
-                        if data:
-                            # Create dataframe
-                            column_names = [col[1] for col in columns]
-                            df = pd.DataFrame(data, columns=column_names)
-                            
-                            # Display with sorting and filtering
+                        if row_count:
+                            # Only the first rows are shown; the whole table goes to the export file
+                            st.caption(f"Preview of the first {PREVIEW_ROWS} rows")
                             st.dataframe(
-                                df,
+                                preview(conn, query),
                                 use_container_width=True,
                                 height=400
                             )
@@ -69,7 +78,7 @@ def main():
                             # Statistics
                             col1, col2 = st.columns(2)
                             with col1:
-                                st.metric("Total Rows", len(df))
+                                st.metric("Total Rows", row_count)
                             with col2:
                                 st.metric("Total Columns", len(columns))
                             
@@ -88,7 +97,7 @@ def main():
                             
                             # Query interface
                             with st.expander("Run Custom Query"):
-                                query = st.text_area(
+                                custom_query = st.text_area(
                                     "SQL Query",
                                     value=f"SELECT * FROM {table_name} LIMIT 10",
                                     height=100
@@ -96,7 +105,7 @@ def main():
                                 
                                 if st.button("Execute Query", key=f"query_{i}"):
                                     try:
-                                        result = pd.read_sql_query(query, conn)
+                                        result = pd.read_sql_query(custom_query, conn)
                                         st.dataframe(result, use_container_width=True)
                                         st.success(f"Query executed successfully. Returned {len(result)} rows.")
                                     except Exception as e:
@@ -105,15 +114,33 @@ def main():
                             st.info("No data in this table.")
                             
                         # Export options
-                        if data:
-                            csv = df.to_csv(index=False)
-                            st.download_button(
-                                label=f"📥 Download {table_name} as CSV",
-                                data=csv,
-                                file_name=f"{table_name}_{pd.Timestamp.now().strftime('%Y%m%d')}.csv",
-                                mime="text/csv",
-                                key=f"download_{i}"
+                        if row_count:
+                            export_format = st.radio(
+                                "Export format",
+                                list(EXPORT_FORMATS),
+                                horizontal=True,
+                                format_func=lambda f: "CSV (gzip)" if f == 'csv' else "Parquet",
+                                key=f"format_{i}"
                             )
+                            st.caption(f"Downloads are limited to {EXPORT_MAX_BYTES // 2**20} MB; "
+                                       "use python data_export.py for larger exports")
+                            if st.button(f"Prepare {table_name} export", key=f"export_{i}"):
+                                with st.spinner("Writing export file..."):
+                                    prepare_export(conn, table_query(table_name), export_format,
+                                                   (table_name, export_format))
+                            
+                            export_file = st.session_state.get('export_file')
+                            if (export_file and export_file['key'] == (table_name, export_format)
+                                    and os.path.exists(export_file['path'])):
+                                with open(export_file['path'], 'rb') as f:
+                                    st.download_button(
+                                        label=f"📥 Download {table_name} ({export_file['rows']} rows)",
+                                        data=f,
+                                        file_name=f"{table_name}_{pd.Timestamp.now().strftime('%Y%m%d')}"
+                                                  f"{EXPORT_FORMATS[export_format]}",
+                                        mime="application/gzip" if export_format == 'csv' else "application/octet-stream",
+                                        key=f"download_{i}"
+                                    )
             else:
                 st.warning("No tables found in the database.")
             